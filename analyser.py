@@ -1,15 +1,33 @@
+import argparse
+import contextlib
+import csv
+import hashlib
+import os
+import shutil
+import sys
+import threading
+
+import lib.catalogue
 import lib.importer
+import lib.lattice
 import lib.benzenoids as bz
+import lib.metrics as metrics
+import lib.profiling as profiling
 from subprocess import call
 
 #boundary code to coordinates and convexity deficit
 def render_hexagon(input_str):
     try:
-        hex_list = lib.importer.bec_to_hex_list(input_str)
-        b = bz.Benzenoid(hex_list)
-        realbc = b.boundary_edges_code()
+        with metrics.stage('bec_to_hex_list'):
+            hex_list = lib.importer.bec_to_hex_list(input_str)
+        with metrics.stage('construct'):
+            b = bz.Benzenoid(hex_list)
+        with metrics.stage('boundary_edges_code'):
+            realbc = b.boundary_edges_code()
         hex2pdf(b)
-        return 'bc:' + str(realbc) + '; coordinates:' + str(hex_list) + '; deficit: ' + str(b.convex_deficit())
+        with metrics.stage('convex_deficit'):
+            cd = b.convex_deficit()
+        return 'bc:' + str(realbc) + '; coordinates:' + str(hex_list) + '; deficit: ' + str(cd)
     except:
         e= "Error: not a valid boundary code!"
 #        e = traceback.print_exc()
@@ -17,63 +35,110 @@ def render_hexagon(input_str):
         return e
 
 
-#parse string to coordinates list (probably not a very safe method)
+#parse string to coordinates list
 def str2coord(input_str):
-    #input_str has to be converted to a list of coordinates
-    coordlist = []
-    if(input_str[0] == '['):
-        newstr1 = input_str.replace("[","")
-    else:
-        newstr1 = input_str
-    if(newstr1[-1] == ']'):
-        newstr11 = newstr1.replace("]","")
-    else:
-        newstr11= newstr1
-    newstr = newstr11.replace(" ","")
-    ls = len(newstr)
-    if(ls == 0):
-        raise Exception("Error! Empty coordinates list!")
-    
-    spstr = newstr.split(',') #now every first entry is (num and every second is num)
-    cura = 0
-    curb = 0
-    for s in spstr:
-        if(s==""):
-            continue
-        sopen = s.find('(')
-        sclose = s.find(')')
-        if(sopen != -1):
-            cura = int(s[sopen+1:])
-        elif(sclose != -1):
-            curb = int(s[:sclose])
-            p = (cura,curb)
-            coordlist.append(p)
-        else:
-            raise Exception("Error! Weird format!"+s)
-    return coordlist
-            
+    try:
+        return lib.importer.parse_coordinates(input_str)
+    except ValueError as error:
+        raise Exception("Error! " + str(error))
+
+
+#columns of the rows made by batch_analyse
+BATCH_FIELDS = ['position', 'h', 'bec', 'deficit', 'error']
+
+
+#stream of importer records to rows of invariants (no picture is made)
+def batch_analyse(records):
+    for record in records:
+        row = {'position': record.position, 'h': None, 'bec': None, 'deficit': None, 'error': record.error}
+        if record.error is None:
+            try:
+                #the perimeter is traced on the set of hexagons (no object graph is built)
+                faces = set(record.hexagons)
+                if not lib.lattice.is_connected(faces):
+                    raise Exception("Error! The benzenoid is not connected!")
+                row['h'] = len(faces)
+                row['bec'] = lib.lattice.boundary_edges_code(faces)
+                row['deficit'] = lib.lattice.convex_deficit(row['bec'])
+            except Exception as error:
+                row['error'] = str(error)
+        yield row
+
 
 #coordinate string to boundary code and convexity deficit
 def str2benzenoid(input_str):
     try:
-        coord = str2coord(input_str)
-        benz = bz.Benzenoid(coord)
-        bec = benz.boundary_edges_code()
-        cd = benz.convex_deficit()
+        with metrics.stage('str2coord'):
+            coord = str2coord(input_str)
+        with metrics.stage('construct'):
+            benz = bz.Benzenoid(coord)
+        if not benz.is_connected():
+            raise Exception("Error! The benzenoid is not connected!")
+        with metrics.stage('boundary_edges_code'):
+            bec = benz.boundary_edges_code()
+        with metrics.stage('convex_deficit'):
+            cd = benz.convex_deficit()
         hex2pdf(benz)
         return 'bc:' + str(bec) + '; deficit: ' + str(cd)
     except Exception as error:
-        print(error)
+        return str(error)  # Shown on the results page (getBCI finds no picture in it).
+
+
+#benzenoid object to a JSON-serialisable dictionary with invariants and geometry
+def benzenoid2json(benz, edge_length=1.4):
+    import numpy  # Imported lazily to keep start-up fast.
+    with metrics.stage('boundary_edges_code'):
+        bec = benz.boundary_edges_code()
+    with metrics.stage('convex_deficit'):
+        cd = benz.convex_deficit()
+    with metrics.stage('geometry'):
+        coords = lib.lattice.vertex_coordinates(numpy.array(benz.vertex_labels()).reshape(-1, 3), edge_length)
+        perimeter = benz.perimeter_set()
+        edges = benz.edge_endpoints().tolist()
+        flags = [label in perimeter for label in benz.edge_labels()]
+    return {'bec': bec, 'deficit': cd, 'h': benz.get_h(), 'hexagons': sorted(benz.face_coordinates()),
+            'vertices': numpy.round(coords, 3).tolist(), 'edges': edges, 'perimeter': flags}
+
+
+#coordinate string to the dictionary of benzenoid2json (no picture is made)
+def str2json(input_str):
+    with metrics.stage('str2coord'):
+        coord = str2coord(input_str)
+    with metrics.stage('construct'):
+        benz = bz.Benzenoid(coord)
+    if not benz.is_connected():
+        raise Exception("Error! The benzenoid is not connected!")
+    return benzenoid2json(benz)
+
+
+#boundary code to the dictionary of invariants stored in the catalogue (no picture is made)
+def bec2record(input_str):
+    with metrics.stage('bec_to_hex_list'):
+        hex_list = lib.importer.bec_to_hex_list(input_str)
+    with metrics.stage('construct'):
+        benz = bz.Benzenoid(hex_list)
+    with metrics.stage('record'):
+        return lib.catalogue.benzenoid_record(benz)
+
+
+#pictures are written to files named by the BEC, so threads (requests and upload jobs) render one at a time
+PICTURE_LOCK = threading.RLock()
 
 
 #benzenoid object to tex to pdf
 def hex2pdf(benz):
+    with PICTURE_LOCK:
+        return _hex2pdf(benz)
+
+
+def _hex2pdf(benz):
     bec = benz.boundary_edges_code()
     outfile = "static/outfiles/"+str(bec)+".tex"
     pdffile = "static/outfiles/"+str(bec)+".pdf"
     pngfile = "static/outfiles/"+str(bec)+".png"
     template = "./templates/picture.tex"
-    bec2tikz = benz.tikz_picture_simple()
+    with metrics.stage('tikz'):
+        bec2tikz = benz.tikz_picture_simple()
     text = "";
     file = open(template,"r")
     f = open(outfile,"w")
@@ -84,8 +149,17 @@ def hex2pdf(benz):
             f.write(line)
     file.close()
     f.close()
-    call(["pdflatex", "-output-directory=static/outfiles/", outfile])
-    call(["convert", pdffile, pngfile])
+    with metrics.stage('pdflatex'):
+        call(["pdflatex", "-output-directory=static/outfiles/", outfile])
+    with metrics.stage('convert'):
+        call(["convert", pdffile, pngfile])
+    return pngfile
+
+
+#hexagon list to png picture copied to path (before another thread rewrites the shared files)
+def hex2png(hex_list, path):
+    with PICTURE_LOCK:
+        shutil.copy(hex2pdf(bz.Benzenoid(hex_list)), path)
 
 
 ##main to test program
@@ -106,4 +180,28 @@ def main():
 
     
 if  __name__ =='__main__':
-    main()
+    parser = argparse.ArgumentParser(description='Analyse benzenoids (without arguments a small demo is run).')
+    parser.add_argument('input', nargs='?', help='file with one benzenoid per record')
+    parser.add_argument('-f', '--format', default='bec', choices=sorted(lib.importer.READERS), help='format of the input file')
+    parser.add_argument('-o', '--output', help='CSV file for the results (default: standard output)')
+    parser.add_argument('--profile', metavar='DIR', help='run under cProfile and save the profile into DIR')
+    args = parser.parse_args()
+    if args.input is None:
+        main()
+    else:
+        profile = None
+        with contextlib.ExitStack() as stack:
+            out = sys.stdout if args.output is None else stack.enter_context(open(args.output, 'w', newline=''))
+            writer = csv.DictWriter(out, fieldnames=BATCH_FIELDS)
+            writer.writeheader()
+            if args.profile is not None:
+                digest = hashlib.blake2b()
+                with open(args.input, 'rb') as f:
+                    for block in iter(lambda: f.read(1 << 20), b''):
+                        digest.update(block)
+                profile = stack.enter_context(profiling.Profile(args.profile, 'analyser.py ' + args.input,
+                                                                args.format + '\0' + digest.hexdigest()))
+            for row in batch_analyse(lib.importer.read_benzenoids(args.input, args.format)):
+                writer.writerow(row)
+        if profile is not None:
+            print('profile saved as', os.path.join(args.profile, profile.key + '.prof'), file=sys.stderr)
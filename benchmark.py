@@ -0,0 +1,207 @@
+#benchmark the public Benzenoid methods on standard families of increasing size
+
+import argparse
+import contextlib
+import datetime
+import inspect
+import io
+import json
+import math
+import os
+import platform
+import shutil
+import subprocess
+import statistics
+import sys
+import time
+import tracemalloc
+
+import lib.benzenoids as bz
+import lib.families as families
+import lib.importer
+import analyser
+
+
+FAMILIES = {
+    'acene': (families.linear_acene, [2, 4, 8, 16, 32, 64]),
+    'rhombus': (lambda k: families.parallelogram(k, k), [2, 3, 4, 6, 8, 11]),
+    'parallelogram': (lambda k: families.parallelogram(2 * k, k), [1, 2, 3, 4, 6, 8]),
+    'hexagonal': (families.hexagonal, [1, 2, 3, 4, 5, 7]),
+    'triangular': (families.triangular, [2, 3, 4, 6, 8, 11]),
+    'coronoid': (families.coronoid, [2, 3, 4, 5, 6, 8]),
+    'random': (lambda k: families.random_growth(k, seed=k), [4, 8, 16, 32, 64, 128]),
+}
+
+# Methods that mutate the object, need arguments or allocate resources the caller must release
+# (blocks of shared memory) are not benchmarked.
+SKIPPED_METHODS = {'add_hexagon', 'to_shared_memory'}
+
+# Methods that are too expensive for large systems are skipped above the given number of vertices.
+METHOD_LIMITS = {
+    'symbolic_spectrum': 30,
+    'sympy_adjacency_matrix': 200,
+    'adjacency_matrix': 1000,
+    'tikz_picture': 1000,
+}
+
+
+def public_methods():
+    """
+    Return the names of public Benzenoid methods that can be called without arguments.
+    """
+    ret = []
+    for name, member in inspect.getmembers(bz.Benzenoid, inspect.isfunction):
+        if name.startswith('_') or name in SKIPPED_METHODS:
+            continue
+        params = list(inspect.signature(member).parameters.values())[1:]
+        if all(p.default is not inspect.Parameter.empty or
+               p.kind in (p.VAR_POSITIONAL, p.VAR_KEYWORD) for p in params):
+            ret.append(name)
+    return ret
+
+
+def measure(func, repeat):
+    """
+    Call func repeatedly and return the wall times and the peak memory (in bytes) of one call.
+
+    Note: func is called once more under tracemalloc, which is not included in the timings.
+    """
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        tracemalloc.start()
+        try:
+            func()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return times, peak
+
+
+def run_case(family, size, hexagons, methods, repeat, with_pdf):
+    """
+    Benchmark one benzenoid and return the list of result records.
+    """
+    records = []
+    base = bz.Benzenoid(hexagons)
+    info = {'family': family, 'size': size, 'h': base.get_h(), 'n': base.get_n(), 'm': base.get_m()}
+
+    def record(name, func):
+        entry = dict(info, name=name)
+        try:
+            times, peak = measure(func, repeat)
+            entry.update(wall=times, best=min(times), peak_bytes=peak)
+        except Exception as error:
+            entry.update(error='{0}: {1}'.format(type(error).__name__, error))
+        records.append(entry)
+
+    record('Benzenoid', lambda: bz.Benzenoid(hexagons))
+    for name in methods:
+        if info['n'] > METHOD_LIMITS.get(name, math.inf):
+            continue
+        # Every call gets a fresh object, so that memoized results do not distort the timings.
+        record(name, lambda: getattr(bz.Benzenoid(hexagons), name)())
+    if base.is_simply_connected():
+        bec = base.boundary_edges_code()
+        record('bec_to_hex_list', lambda: lib.importer.bec_to_hex_list(bec))
+    coord_str = str(list(hexagons))
+    record('str2coord', lambda: analyser.str2coord(coord_str))
+    if with_pdf:
+        record('hex2pdf', lambda: analyser.hex2pdf(base))
+    return records
+
+
+def scaling_report(results):
+    """
+    Return the empirical exponents t ~ h^k between the two largest sizes of each family.
+    """
+    series = {}
+    for r in results:
+        if 'best' in r:
+            series.setdefault((r['family'], r['name']), []).append((r['h'], r['best']))
+    report = {}
+    for key, points in series.items():
+        points.sort()
+        (h1, t1), (h2, t2) = points[-2:] if len(points) > 1 else (points[0], points[0])
+        if h2 > h1 and t1 > 0:
+            report['{0}/{1}'.format(*key)] = round(math.log(t2 / t1) / math.log(h2 / h1), 2)
+    return report
+
+
+def compare(results, previous):
+    """
+    Return the ratios of best times (current / previous) for the cases present in both runs.
+    """
+    old = {(r['family'], r['size'], r['name']): r['best'] for r in previous['results'] if 'best' in r}
+    ret = {}
+    for r in results:
+        key = (r['family'], r['size'], r['name'])
+        if 'best' in r and key in old and old[key] > 0:
+            ret['{0}/{1}/{2}'.format(*key)] = round(r['best'] / old[key], 3)
+    return ret
+
+
+def startup_time(module='analyser', repeat=10):
+    """
+    Return the median wall time (in seconds) of starting Python and importing the module.
+    """
+    code = 'import time; s = time.perf_counter(); import {0}; print(time.perf_counter() - s)'.format(module)
+    times = []
+    for _ in range(repeat):
+        out = subprocess.check_output([sys.executable, '-c', code], stderr=subprocess.DEVNULL)
+        times.append(float(out.decode().strip().splitlines()[-1]))
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Benzenoid methods on generated families.')
+    parser.add_argument('-o', '--output', default='bench_output.json', help='JSON file with the results')
+    parser.add_argument('-f', '--families', default=','.join(FAMILIES), help='comma separated list of families')
+    parser.add_argument('-m', '--methods', default=None, help='comma separated list of methods (default: all)')
+    parser.add_argument('-n', '--max-sizes', type=int, default=None, help='use only the first N sizes')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='number of timed calls per case')
+    parser.add_argument('--pdf', action='store_true', help='also benchmark hex2pdf (needs pdflatex)')
+    parser.add_argument('--compare', default=None, help='JSON file of a previous run to compare with')
+    parser.add_argument('--startup', action='store_true', help='only measure the time of importing analyser')
+    args = parser.parse_args()
+
+    if args.startup:
+        print('import analyser: {0:.1f} ms'.format(1000 * startup_time()))
+        return
+
+    methods = public_methods() if args.methods is None else args.methods.split(',')
+    with_pdf = args.pdf and shutil.which('pdflatex') is not None
+    if with_pdf:
+        os.makedirs('static/outfiles', exist_ok=True)
+    results = []
+    for family in args.families.split(','):
+        generator, sizes = FAMILIES[family]
+        for size in sizes[:args.max_sizes]:
+            print('{0} {1}'.format(family, size), file=sys.stderr)
+            results.extend(run_case(family, size, generator(size), methods, args.repeat, with_pdf))
+
+    output = {
+        'meta': {
+            'date': datetime.datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'version': bz.__version__,
+            'repeat': args.repeat,
+        },
+        'results': results,
+        'scaling': scaling_report(results),
+    }
+    if args.compare is not None:
+        with open(args.compare) as f:
+            output['comparison'] = compare(results, json.load(f))
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=1)
+    for key, exponent in sorted(output['scaling'].items(), key=lambda kv: -kv[1]):
+        print('{0:40s} ~ h^{1}'.format(key, exponent))
+
+
+if __name__ == '__main__':
+    main()
@@ -39,3 +39,55 @@ def dfs(start, neighbors):
             seen.add(w)
             queue.append(w)
     return component
+
+
+class UnionFind(object):
+
+    def __init__(self):
+        """
+        Construct an empty union-find (disjoint-set) structure.
+        """
+        self.parent = dict()
+        self.size = dict()
+        self.count = 0  # Number of sets.
+
+    def add(self, x):
+        """
+        Add x as a new singleton set (if not already present).
+        """
+        if x not in self.parent:
+            self.parent[x] = x
+            self.size[x] = 1
+            self.count += 1
+
+    def find(self, x):
+        """
+        Return the representative of the set containing x.
+        """
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]  # Path halving.
+            x = parent[x]
+        return x
+
+    def union(self, x, y):
+        """
+        Merge the sets containing x and y.
+        """
+        x, y = self.find(x), self.find(y)
+        if x == y:
+            return
+        if self.size[x] < self.size[y]:
+            x, y = y, x
+        self.parent[y] = x
+        self.size[x] += self.size[y]
+        self.count -= 1
+
+    def groups(self):
+        """
+        Return the list of sets (each as a list of its elements).
+        """
+        ret = dict()
+        for x in self.parent:
+            ret.setdefault(self.find(x), []).append(x)
+        return list(ret.values())
@@ -2,14 +2,78 @@ __author__ = 'Nino Bašić <nino.basic@fmf.uni-lj.si>'
 __version__ = '0.1'
 
 
+import copy
 import functools
 import fractions
-
-import networkx  # Library for graphs and networks (version >= 1.8.1)
-import numpy  # Library for numeric computation (version >= 1.8.1)
-import sympy  # Library for symbolic computation (version >= 0.7.5)
+import pickle
+import struct
 
 import lib.algorithms as algorithms
+import lib.distances as distances
+import lib.lattice as lattice
+import lib.matchings as matchings
+
+# NetworkX (version >= 1.8.1), NumPy (version >= 1.8.1) and SymPy (version >= 0.7.5) are
+# imported inside the methods that need them. The common path (BEC, deficit, drawing) uses
+# none of them, so importing this module stays cheap.
+
+
+# Maps the name of every memoized property to the names of properties it is derived from.
+# The special name 'faces' stands for the set of hexagons itself.
+MEMO_INPUTS = dict()
+
+# Names of memoized properties whose values do not refer to Face/Edge/Vertex objects, so
+# they can be serialised along with the hexagons (see Benzenoid.to_bytes).
+PORTABLE_MEMO = set()
+
+# Serialisation format (see Benzenoid.to_bytes).
+BYTES_MAGIC = b'BZNB\x01'
+BYTES_HEADER = struct.Struct('<5sIII')  # Magic, number of hexagons, length of pickle, number of buffers.
+
+
+def memoized(*inputs, portable=True):
+    """
+    Decorator for Benzenoid methods without arguments whose results are kept in the memo
+    dictionary (under the name of the method). The arguments name the inputs of the property,
+    i.e. 'faces' and/or other memoized properties, and determine which results are erased by
+    Benzenoid.invalidate. Values of properties that are not portable (because they refer to
+    objects of the graph) are not serialised.
+
+    Note: The memoized value itself is returned, so it must not be modified by the caller.
+    """
+    def decorator(method):
+        name = method.__name__
+        MEMO_INPUTS[name] = inputs
+        memo_dependents.cache_clear()
+        if portable:
+            PORTABLE_MEMO.add(name)
+        else:
+            PORTABLE_MEMO.discard(name)
+
+        @functools.wraps(method)
+        def wrapper(self):
+            if name not in self.memo:
+                self.memo[name] = method(self)
+            return self.memo[name]
+        return wrapper
+    return decorator
+
+
+@functools.lru_cache(maxsize=None)
+def memo_dependents(changed):
+    """
+    Return the set of memoized properties derived (directly or indirectly) from any of the
+    given inputs (a tuple of names).
+    """
+    ret = set()
+    stack = list(changed)
+    while len(stack) > 0:
+        x = stack.pop()
+        for name, inputs in MEMO_INPUTS.items():
+            if x in inputs and name not in ret:
+                ret.add(name)
+                stack.append(name)
+    return frozenset(ret)
 
 
 def centre_of_mass(coords):
@@ -22,9 +86,11 @@ def centre_of_mass(coords):
 
 class Face(object):
 
-    def __init__(self, face_label, benzenoid):
+    def __init__(self, face_label, benzenoid, update=True):
         """
-        Construct a face inside the given benzenoid.
+        Construct a face inside the given benzenoid. If update is False, the adjacency/incidence
+        lists of the face and its neighbourhood are left for the caller to rebuild (see
+        Benzenoid._add_hexagons).
         """
         self.label = face_label
         self.benzenoid = benzenoid
@@ -49,6 +115,8 @@ class Face(object):
             else:
                 edge = self.benzenoid.edge_dict[edge_label]
             self.__edge_list.append(edge)
+        if not update:
+            return
 
         # Update information on neighbours.
         self.__face_list = []
@@ -177,17 +245,24 @@ class Edge(object):
         self.__edge_list = []
         self.__face_list = []
 
-    def update_vertex_list(self):
+    @staticmethod
+    def endpoint_labels(label):
         """
-        Rebuild the list of incident vertices.
+        Return the canonical labels of both endpoints of the edge with the given canonical label.
         """
-        xi, eta, nu = self.label
+        xi, eta, nu = label
         if nu == 0:
-            incident = [(xi - 1, eta, 1), (xi, eta, 0)]
+            return [(xi - 1, eta, 1), (xi, eta, 0)]
         elif nu == 1:
-            incident = [(xi, eta, 0), (xi, eta, 1)]
+            return [(xi, eta, 0), (xi, eta, 1)]
         else:  # nu == 2
-            incident = [(xi, eta, 1), (xi + 1, eta - 1, 0)]
+            return [(xi, eta, 1), (xi + 1, eta - 1, 0)]
+
+    def update_vertex_list(self):
+        """
+        Rebuild the list of incident vertices.
+        """
+        incident = Edge.endpoint_labels(self.label)
         self.__vertex_list = [self.benzenoid.vertex_dict[label] for label in incident
                               if label in self.benzenoid.vertex_dict]
 
@@ -272,9 +347,7 @@ class Edge(object):
         """
         Return True if and only if this edges belongs to the perimeter.
         """
-        if 'perimeter_set' not in self.benzenoid.memo:
-            self.benzenoid.perimeter()
-        return self.label in self.benzenoid.memo['perimeter_set']
+        return self.label in self.benzenoid.perimeter_set()
 
     def belongs_to_hole(self):
         """
@@ -438,13 +511,7 @@ class Vertex(object):
 
 class Benzenoid(object):
 
-    properties_erased_by_add = [
-        'perimeter',
-        'perimeter_vertices',
-        'perimeter_set',
-        'list_of_holes',
-        'list_of_holes_vertices',
-    ]
+    # Properties erased by adding a hexagon are those derived from 'faces' (see MEMO_INPUTS).
     properties_updated_by_add = [
         'bottom_left_hexagon',
     ]
@@ -458,9 +525,14 @@ class Benzenoid(object):
         self.face_dict = dict()
 
         # This dictionary keeps certain properties that are hard to compute
-        # (therefore they are reasonable to memoize).
+        # (therefore they are reasonable to memoize). See the memoized decorator.
         self.memo = dict()
 
+        # Connected components of hexagons are maintained as hexagons are added.
+        self.components_forest = algorithms.UnionFind()
+        # So is the set of empty slots adjacent to hexagons (including those inside holes).
+        self.frontier = set()
+
         # prev_vertex = set()
         # prev_edge = set()
         # prev_face = set()
@@ -522,37 +594,95 @@ class Benzenoid(object):
             Face(h, self)
             # Update the info on bottom-most left-most hexagon.
             self._update_bottom_left_hexagon(h)
-        # Erase stored properties that might change by adding a new hexagon.
-        for property_name in self.properties_erased_by_add:
-            if property_name in self.memo:
-                del self.memo[property_name]
+            # Update the info on connected components.
+            self.components_forest.add(h)
+            self.frontier.discard(h)
+            for f in lattice.face_neighbours(h):
+                if f in self.face_dict:
+                    self.components_forest.union(h, f)
+                else:
+                    self.frontier.add(f)
+            # Erase stored properties that change by adding a new hexagon.
+            self.invalidate('faces')
+
+    def _add_hexagons(self, hexagons):
+        """
+        Add hexagons (given by canonical labels) at once. The result is the same as adding them
+        one by one by add_hexagon, but every adjacency/incidence list is built once at the end
+        instead of being refreshed around each new hexagon.
+        """
+        new = [h for h in dict.fromkeys(hexagons) if h not in self.face_dict]
+        for h in new:
+            Face(h, self, update=False)
+        for face in self.face_dict.values():
+            face.update_face_list()
+        for edge in self.edge_dict.values():
+            edge.update_every_list()
+        for vertex in self.vertex_dict.values():
+            vertex.update_every_list()
+        for h in new:
+            self._update_bottom_left_hexagon(h)
+            self.components_forest.add(h)
+            self.frontier.discard(h)
+        for h in new:
+            for f in lattice.face_neighbours(h):
+                if f in self.face_dict:
+                    self.components_forest.union(h, f)
+                else:
+                    self.frontier.add(f)
+        self.invalidate('faces')
+
+    def invalidate(self, *changed):
+        """
+        Erase the memoized properties that are derived from the given (changed) inputs.
+        """
+        for name in memo_dependents(changed):
+            self.memo.pop(name, None)
+
+    @memoized('faces')
+    def hole_cells(self):
+        """
+        Return the list of holes. Each hole is represented as the sorted list of labels of
+        the (missing) hexagons inside it.
+        """
+        return lattice.hole_cells(self.face_dict)
 
+    @memoized('hole_cells', portable=False)
     def list_of_holes(self):
         """
-        Return the list of holes. Each hole is represented as list of boundary edges.
+        Return the list of holes. Each hole is represented as list of boundary edges (in the
+        order in which they appear along the boundary of the hole).
         """
-        if 'list_of_holes' in self.memo:
-            return self.memo['list_of_holes']
         ret = []
-        # Build the graph of boundary edges that do not belong to the perimeter.
-        boundary_graph = {e: [w for w in e.adjacent_edges() if w.belongs_to_hole()]
-                          for e in self.edge_dict.values() if e.belongs_to_hole()}
-        discovered = set()
-        for e in boundary_graph:
-            if e.label in discovered:
-                continue
-            hole = algorithms.dfs(e, neighbors=lambda w: boundary_graph[w])
-            ret.append(hole)
-            discovered.update(w.label for w in hole)
-        self.memo['list_of_holes'] = ret
-        return self.memo['list_of_holes']
+        for cells in self.hole_cells():
+            # Boundary edges separate a cell of the hole from a hexagon of the benzenoid.
+            incident = dict()
+            for c in cells:
+                for nu, f in enumerate(lattice.face_neighbours(c)):
+                    if f in self.face_dict:
+                        label = Edge.canonical_label(c + (nu,))
+                        for v in Edge.endpoint_labels(label):
+                            incident.setdefault(v, []).append(label)
+            # Walk around the hole (every vertex of the cycle is incident to two of its edges).
+            start = min(min(labels) for labels in incident.values())
+            hole = [start]
+            v = Edge.endpoint_labels(start)[1]
+            while True:
+                e1, e2 = incident[v]
+                label = e2 if e1 == hole[-1] else e1
+                if label == start:
+                    break
+                hole.append(label)
+                u, w = Edge.endpoint_labels(label)
+                v = w if u == v else u
+            ret.append([self.edge_dict[label] for label in hole])
+        return ret
 
+    @memoized('list_of_holes', portable=False)
     def list_of_holes_vertices(self):
         """
         Return the list of holes. Each hole is prepresented as list of boundary vertices.
         """
-        if 'list_of_holes_vertices' in self.memo:
-            return self.memo['list_of_holes_vertices']
         ret = []
         hole_list = self.list_of_holes()
         for hole in hole_list:
@@ -562,48 +692,70 @@ class Benzenoid(object):
                 u, v = e.incident_vertices()
                 v_list.append(u if u in hole[(i+1) % n].incident_vertices() else v)
             ret.append(v_list)
-        self.memo['list_of_holes_vertices'] = ret
-        return self.memo['list_of_holes_vertices']
+        return ret
+
+    @memoized('list_of_holes_vertices')
+    def hole_codes(self):
+        """
+        Return the list of boundary-edges codes of holes (computed from the degrees of vertices
+        along the boundary of each hole in the same way as the BEC of the perimeter).
+        """
+        return [lattice.bec_from_degrees(''.join(str(v.get_degree()) for v in hole))
+                for hole in self.list_of_holes_vertices()]
+
+    def canonical_descriptor(self):
+        """
+        Return the pair (BEC of the perimeter, tuple of codes of holes in decreasing order).
+
+        Note: For simply connected benzenoids the BEC alone describes the benzenoid. The
+        descriptor does not record the relative positions of holes.
+        """
+        return self.boundary_edges_code(), tuple(sorted(self.hole_codes(), reverse=True))
 
+    @memoized('faces', portable=False)
     def perimeter(self):
         """
         Return the perimeter (the cycle formed of external edges).
 
         Note: Some authors call it boundary. (For us the boundary is the union of perimeter and holes.)
         """
-        if 'perimeter' in self.memo:
-            return self.memo['perimeter']
         e = self.get_bottom_left_hexagon().get_incident_edge(4)
-        self.memo['perimeter'] = algorithms.dfs(e, neighbors=lambda w: (d for d in w.adjacent_edges()
-                                                                        if d.is_boundary()))
-        # Store the labels of vertices on the perimeter in a set data-structure.
-        self.memo['perimeter_set'] = {e.label for e in self.memo['perimeter']}
-        return self.memo['perimeter']
+        return algorithms.dfs(e, neighbors=lambda w: (d for d in w.adjacent_edges() if d.is_boundary()))
+
+    @memoized('perimeter')
+    def perimeter_set(self):
+        """
+        Return the set of labels of edges on the perimeter.
+        """
+        return {e.label for e in self.perimeter()}
 
+    @memoized('perimeter', portable=False)
     def perimeter_vertices(self):
         """
         Return the list of vertices on the perimeter.
         """
-        if 'perimeter_vertices' in self.memo:
-            return self.memo['perimeter_vertices']
         ret = []
         p = self.perimeter()
         n = len(p)  # Length of the perimeter.
         for i, e in enumerate(p):
             u, v = e.incident_vertices()
             ret.append(u if u in p[(i+1) % n].incident_vertices() else v)
-        self.memo['perimeter_vertices'] = ret
-        return self.memo['perimeter_vertices']
+        return ret
 
     def is_connected(self):
         """
         Return True if the benzenoid is connected.
         """
-        print(self.face_dict)
-        some_face = next(iter(self.face_dict.values()))
-        component = algorithms.bfs(some_face, neighbors=lambda w: w.adjacent_faces())
-        return len(component) == len(self.face_dict)
+        return self.components_forest.count == 1
 
+    def components(self):
+        """
+        Return the list of connected components. Each component is represented as the list of
+        labels of its hexagons.
+        """
+        return self.components_forest.groups()
+
+    @memoized('list_of_holes')
     def is_simply_connected(self):
         """
         Return True if and only if this benzenoid system is simply connected.
@@ -616,8 +768,7 @@ class Benzenoid(object):
         """
         output = []
         label_mapping = dict()
-        self.perimeter_vertices()
-        peri_vert = [v.label for v in self.memo['perimeter_vertices']]
+        peri_vert = [v.label for v in self.perimeter_vertices()]
         output_buffer = []
         for node in self.vertex_dict.values():
             x, y = node.get_coordinates()
@@ -628,7 +779,7 @@ class Benzenoid(object):
                 tikz_label, x, y, node_color))
             output_buffer.append(r'\node[fill={3}] at ({0}) {{}};'.format(
                 tikz_label, x, y, node_color))
-        peri = {e.label for e in self.memo['perimeter']}
+        peri = self.perimeter_set()
         centres = []
         for face in self.face_dict.values():
             coords = [v.get_coordinates() for v in face.incident_vertices()]
@@ -675,8 +826,7 @@ class Benzenoid(object):
         """
         output = []
         label_mapping = dict()
-        self.perimeter_vertices()
-        peri_vert = [v.label for v in self.memo['perimeter_vertices']]
+        peri_vert = [v.label for v in self.perimeter_vertices()]
         for node in self.vertex_dict.values():
             x, y = node.get_coordinates()
             tikz_label = '_'.join(str(t) for t in node.label)
@@ -684,7 +834,7 @@ class Benzenoid(object):
             node_color = colors.get(node.label, default_color)
             output.append(r'\node[] ({0}) at ({1:.6f}, {2:.6f}) {{}};'.format(
                 tikz_label, x, y, node_color))
-        peri = {e.label for e in self.memo['perimeter']}
+        peri = self.perimeter_set()
         # print(peri)
         for edge in self.edge_dict.values():
             uv = [label_mapping[w.label] for w in edge.incident_vertices()]
@@ -711,8 +861,7 @@ class Benzenoid(object):
         """
         output = []  # TODO: clean up (and generalize) this code!!!
         label_mapping = dict()
-        self.perimeter_vertices()
-        peri_vert = [v.label for v in self.memo['perimeter_vertices']]
+        peri_vert = [v.label for v in self.perimeter_vertices()]
         print(peri_vert)
         hole_dict = {}
 
@@ -733,7 +882,7 @@ class Benzenoid(object):
             xx = peri_vert.index(node.label) if node.label in peri_vert else ''
             xx = ''
             output.append(r'\node[{3}] ({0}) at ({1:.6f}, {2:.6f}) {{{4}}};'.format(tikz_label, x, y, node_type, xx))
-        peri = {e.label for e in self.memo['perimeter']}
+        peri = self.perimeter_set()
         print(peri)
         for edge in self.edge_dict.values():
             uv = [label_mapping[w.label] for w in edge.incident_vertices()]
@@ -784,54 +933,26 @@ class Benzenoid(object):
             bonds.append((u.get_coordinates(), v.get_coordinates()))
         return atoms, bonds
 
+    @memoized('boundary_edges_code')
     def convex_deficit(self):
-        code = self.boundary_edges_code()
-
-        n = len(code)  # Length of the BEC
-
-        for k in range(1, n):
-            for m in range(n):
-                if m + k <= n:
-                    window = code[m:m + k]
-                else:
-                    window = code[m:] + code[:(m + k) % n]
-                s = 0
-                for x in window:
-                    s += int(x)
-                if s < 2 * k:  # Average is less than 2.
-                    break
-            else:
-                return k - 1
-        return -1
+        """
+        Return the convex deficit of the benzenoid (see lattice.convex_deficit).
+        """
+        return lattice.convex_deficit(self.boundary_edges_code())
 
+    @memoized('faces')
     def boundary_edges_code(self):
         """
         Return the (canonical) boundary-edges code of the benzenoid (as a string).
 
         Note: For more info on boundary-edges code see the paper P. Hansen et al., The boundary-edges code for
         polyhexes, J. Mol. Struct. (Theochem) 363 (1996), no. 2, 237--247.
+
+        Note: Only the perimeter is encoded. Codes of holes are given by hole_codes (see also
+        canonical_descriptor). The perimeter is traced on the set of hexagons (see
+        lattice.perimeter_degrees), so no Edge or Vertex objects are visited.
         """
-        vert_degrees = ''.join(str(v.get_degree()) for v in self.perimeter_vertices())
-
-        def add_spaces(s):
-            new_s = ''
-            while len(s) > 0:
-                new_s += s[:3] + ' '
-                s = s[3:]
-            return new_s.rstrip()
-
-        # print(add_spaces(vert_degrees))
-        if '3' not in vert_degrees:
-            return '6'  # This must be benzene.
-        pos = 0
-        while vert_degrees[pos] != '3':
-            pos += 1
-        code = ''.join(str(len(seg) + 1) for seg in (vert_degrees[pos+1:] + vert_degrees[:pos]).split('3'))
-        all_forms = [code[i:] + code[:i] for i in range(len(code))]
-        code = code[::-1]  # Perform reverse operation on code.
-        all_forms += [code[i:] + code[:i] for i in range(len(code))]
-        all_forms.sort()
-        return all_forms[-1]  # Return lexicographically largest BEC.
+        return lattice.boundary_edges_code(self.face_dict)
 
     def myrvold_format(self, edge_length=1.4):
         """
@@ -845,47 +966,147 @@ class Benzenoid(object):
            the format 'x_i y_i deg_i neighbors_of_i' where x_i and y_i are coordinates of the
            i-th vertex (real numbers), deg_i is the degree of the vertex (an integer), and
            neighbors_of_i is a list of its neighbors.
+
+        Note: Vertices are numbered as in vertex_index().
         """
-        n = len(self.vertex_dict)
-        wendy_label = {label: i for i, label in enumerate(self.vertex_dict)}
-        vertex_data = []
-        for k, v in self.vertex_dict.items():
-            vertex_data.append([wendy_label[k], v.get_coordinates(edge_length=edge_length),
-                                [wendy_label[w.label] for w in v.adjacent_vertices()]])
-        vertex_data.sort()  # Sort by canonical labels (0 ... n-1).
-        ret = '{0}\n'.format(n) + \
-              '\n'.join('{0} {1} {2} {3}'.format(x, y, len(neigh), ' '.join(str(w) for w in neigh))
-                        for label, (x, y), neigh in vertex_data)
-        return ret
+        indptr, indices = self.csr_adjacency()
+        lines = ['{0}'.format(len(self.vertex_dict))]
+        for i, label in enumerate(self.vertex_labels()):
+            x, y = self.vertex_dict[label].get_coordinates(edge_length=edge_length)
+            neigh = indices[indptr[i]:indptr[i + 1]]
+            lines.append('{0} {1} {2} {3}'.format(x, y, len(neigh), ' '.join(str(w) for w in neigh)))
+        return '\n'.join(lines)
 
+    @memoized('faces')
+    def vertex_labels(self):
+        """
+        Return the sorted list of canonical vertex labels. The position of a label in this list
+        is the index of the vertex in all matrix representations of the graph.
+        """
+        return sorted(self.vertex_dict)
+
+    @memoized('vertex_labels')
+    def vertex_index(self):
+        """
+        Return the dictionary that maps canonical vertex labels to indices 0 ... n-1.
+        """
+        return {label: i for i, label in enumerate(self.vertex_labels())}
+
+    @memoized('faces', 'vertex_labels')
+    def csr_adjacency(self):
+        """
+        Return the adjacency matrix in the compressed sparse row format, i.e. a pair of NumPy
+        arrays (indptr, indices) such that the neighbours of the i-th vertex (see vertex_index)
+        are indices[indptr[i]:indptr[i + 1]] (in increasing order).
+
+        Note: The matrix is built directly from the edge labels in one vectorised pass (see
+        lattice.endpoint_indices).
+        """
+        import numpy
+        vertices = numpy.array(self.vertex_labels(), dtype=numpy.int64).reshape(-1, 3)
+        edges = numpy.array(list(self.edge_dict), dtype=numpy.int64).reshape(-1, 3)
+        u, v = lattice.endpoint_indices(vertices, edges)
+        return lattice.csr_from_edges(len(vertices), u, v)
+
+    @memoized('faces')
+    def edge_labels(self):
+        """
+        Return the sorted list of canonical edge labels. The position of a label in this list
+        is the index (id) of the edge.
+        """
+        return sorted(self.edge_dict)
+
+    @memoized('edge_labels', 'vertex_labels')
+    def edge_endpoints(self):
+        """
+        Return the m x 2 NumPy array of indices of endpoints of edges (in the order of edge_labels).
+        """
+        import numpy
+        vertices = numpy.array(self.vertex_labels(), dtype=numpy.int64).reshape(-1, 3)
+        edges = numpy.array(self.edge_labels(), dtype=numpy.int64).reshape(-1, 3)
+        return numpy.stack(lattice.endpoint_indices(vertices, edges), axis=1)
+
+    def distance_matrix(self):
+        """
+        Return the distance matrix of the graph (as a NumPy array; see vertex_index).
+        """
+        indptr, indices = self.csr_adjacency()
+        return distances.distance_matrix(indptr, indices)
+
+    @memoized('edge_endpoints', 'hole_cells')
+    def _cut_indices(self):
+        """
+        Return the pair (Wiener index, Szeged index) computed by the cut method, or None if the
+        method does not apply (i.e. for coronoids).
+        """
+        import numpy
+        if len(self.hole_cells()) > 0:
+            return None
+        classes = numpy.array([nu for _, _, nu in self.edge_labels()], dtype=numpy.int64)
+        return distances.cut_indices(self.get_n(), self.edge_endpoints(), classes)
+
+    @memoized('_cut_indices', 'csr_adjacency')
+    def wiener_index(self):
+        """
+        Return the Wiener index (the sum of distances between all pairs of vertices).
+
+        Note: Benzenoids without holes are handled by the (linear) cut method, other graphs
+        by bit-parallel breadth first searches.
+        """
+        if not self.is_connected():
+            raise ValueError('the benzenoid is not connected')
+        if self._cut_indices() is not None:
+            return self._cut_indices()[0]
+        indptr, indices = self.csr_adjacency()
+        return distances.wiener_index_bfs(indptr, indices)
+
+    @memoized('_cut_indices', 'csr_adjacency', 'edge_endpoints')
+    def szeged_index(self):
+        """
+        Return the Szeged index (the sum of n_u(e) * n_v(e) over all edges e = uv, where n_u(e)
+        is the number of vertices closer to u than to v).
+
+        Note: See wiener_index for the choice of the method.
+        """
+        if not self.is_connected():
+            raise ValueError('the benzenoid is not connected')
+        if self._cut_indices() is not None:
+            return self._cut_indices()[1]
+        indptr, indices = self.csr_adjacency()
+        return distances.szeged_index_bfs(indptr, indices, self.edge_endpoints())
+
+    @memoized('csr_adjacency', portable=False)
     def nx_graph(self):
         """
         Create the NetworkX's Graph object (using benzenoid's edges and vertices).
         """
+        import networkx
+        labels = self.vertex_labels()
+        indptr, indices = self.csr_adjacency()
         g = networkx.Graph()
-        g.add_nodes_from(self.vertex_dict)
-        g.add_edges_from([v.label for v in edge.incident_vertices()] for edge in self.edge_dict.values())
+        g.add_nodes_from(labels)
+        g.add_edges_from((labels[i], labels[j]) for i in range(len(labels))
+                         for j in indices[indptr[i]:indptr[i + 1]] if i < j)
         return g
 
     def adjacency_matrix(self):
         """
         Return the adjacency matrix of the graph (using plain Python).
         """
-        g = self.nx_graph()
-        canonical_label = {node: label for label, node in enumerate(g.nodes_iter())}
-        print(canonical_label)
-        ret = [[0 for _ in range(g.order())] for _ in range(g.order())]
-        for u, neigh in g.adjacency_iter():
-            for v in neigh:
-                ret[canonical_label[u]][canonical_label[v]] = 1
-        return ret
+        return self.numpy_adjacency_matrix().astype(int).tolist()
 
     def numpy_adjacency_matrix(self):
         """
-        Return the adjacency matrix of the graph as a NumPy matrix.
+        Return the adjacency matrix of the graph as a (dense) NumPy array.
         """
-        return networkx.to_numpy_matrix(self.nx_graph())
+        import numpy
+        indptr, indices = self.csr_adjacency()
+        n = len(indptr) - 1
+        ret = numpy.zeros((n, n))
+        ret[numpy.repeat(numpy.arange(n), numpy.diff(indptr)), indices] = 1
+        return ret
 
+    @memoized('spectrum')
     def perfect_matchings(self):
         """
         Return the number of perfect matchings.
@@ -895,33 +1116,87 @@ class Benzenoid(object):
         # print(self.spectrum())
         eigvals = sorted([float(x) for x in self.spectrum()], key=lambda x: -x)
         n = len(eigvals)
+        if n % 2 == 1:
+            return 0
         k = round(functools.reduce(lambda x, y: x*y, [eigvals[i] for i in range(n // 2)]))
         return k
 
+    @memoized('csr_adjacency', 'perfect_matchings')
     def pauling_bond_orders(self):
         """
         Return the Pauling bond orders for each bond (as fractions). The function returns
         a dictionary that maps from canonical labels to bond orders.
         """
-        g = self.nx_graph()
-        canonical_labels = {node: label for label, node in enumerate(g.nodes_iter())}
-        adj_inv = numpy.linalg.inv(networkx.to_numpy_matrix(g))
+        import numpy
+        index = self.vertex_index()
+        adj_inv = numpy.linalg.inv(self.numpy_adjacency_matrix())
         # print(adj_inv)
         k = self.perfect_matchings()
         ret = dict()
-        for label, edge in self.edge_dict.items():
-            u, v = [canonical_labels[v.label] for v in edge.incident_vertices()]
+        for label in self.edge_dict:
+            u, v = [index[w] for w in Edge.endpoint_labels(label)]
             # TODO: hack
             # ret[label] = fractions.Fraction(round(float(k * adj_inv[u, v])), k)
             ret[label] = (round(float(k * adj_inv[u, v])), k)
         return ret
 
+    def kekule_structures(self):
+        """
+        Make a generator object that will yield every Kekulé structure (perfect matching) as a
+        bitset (int) with bit i set if the i-th edge (see edge_labels) is a double bond.
+
+        Note: Structures are enumerated lazily by backtracking with forced moves (see
+        matchings.perfect_matchings), so only the current partial structure is kept.
+        """
+        return matchings.perfect_matchings(self.get_n(), self.edge_endpoints())
+
+    def sample_kekule_structures(self, k, seed=None):
+        """
+        Return the list of k Kekulé structures (bitsets, see kekule_structures) drawn uniformly
+        at random and independently. The benzenoid must have no holes.
+        """
+        import numpy
+        if len(self.hole_cells()) > 0:
+            raise ValueError('sampling is not supported for benzenoids with holes')
+        vertices = numpy.array(self.vertex_labels(), dtype=numpy.int64).reshape(-1, 3)
+        return matchings.sample_perfect_matchings(vertices, self.edge_endpoints(), k, seed)
+
+    @memoized('edge_endpoints')
+    def matching_numbers(self):
+        """
+        Return the list [m_0, m_1, ..., m_(n//2)], where m_k is the number of matchings with k
+        edges (so m_(n/2) is the number of Kekulé structures), as exact integers.
+
+        Note: Computed by a row-by-row frontier dynamic programme (see matchings.matching_numbers).
+        """
+        import numpy
+        vertices = numpy.array(self.vertex_labels(), dtype=numpy.int64).reshape(-1, 3)
+        return matchings.matching_numbers(vertices, self.edge_endpoints())
+
+    def matching_polynomial(self):
+        """
+        Return the list of (integer) coefficients of the matching polynomial
+        sum_k (-1)^k m_k x^(n - 2k), from the coefficient of x^n down to the constant term.
+        """
+        ret = [0] * (self.get_n() + 1)
+        for k, m_k in enumerate(self.matching_numbers()):
+            ret[2 * k] = -m_k if k % 2 == 1 else m_k
+        return ret
+
+    def hosoya_index(self):
+        """
+        Return the Hosoya index (the number of all matchings, including the empty one).
+        """
+        return sum(self.matching_numbers())
+
     def sympy_adjacency_matrix(self):
         """
         Return the adjacency matrix of the graph as a SymPy matrix.
         """
+        import sympy
         return sympy.Matrix(self.adjacency_matrix())
 
+    @memoized('csr_adjacency')
     def spectrum(self):
         """
         Return the spectrum (as a list of eigenvalues sorted in non-decreasing order) of the
@@ -931,8 +1206,23 @@ class Benzenoid(object):
         are all real numbers. According to the NumPy documentation, the eigenvalues are computed using
         LAPACK routines _ssyevd and _heevd.
         """
+        import numpy
         return numpy.linalg.eigvalsh(self.numpy_adjacency_matrix())
 
+    @memoized('spectrum')
+    def homo_lumo_gap(self):
+        """
+        Return the HOMO-LUMO gap in units of |beta|, i.e. the difference between the n/2-th and
+        the (n/2 + 1)-th largest eigenvalue of the adjacency matrix. For odd n the singly
+        occupied orbital is non-bonding and the gap is 0.
+        """
+        spectrum = self.spectrum()
+        n = len(spectrum)
+        if n % 2 == 1:
+            return 0.0
+        return float(spectrum[n // 2] - spectrum[n // 2 - 1])
+
+    @memoized('csr_adjacency', portable=False)
     def symbolic_spectrum(self):
         """
         Return the spectrum (as a dictionary of eigenvalues) of the graphs that is obtained
@@ -950,19 +1240,226 @@ class Benzenoid(object):
 
     def copy(self):
         """
-        Create an exact copy of this benzenoid.
+        Create an exact copy of this benzenoid (with copies of portable memoized properties).
         """
-        return Benzenoid(self.face_coordinates())
+        ret = Benzenoid()
+        ret._add_hexagons(self.face_coordinates())
+        ret.memo.update(copy.deepcopy({name: value for name, value in self.memo.items() if name in PORTABLE_MEMO}))
+        return ret
+
+    def to_bytes(self, memo=True):
+        """
+        Return the serialised benzenoid: the packed array of hexagon labels (in the order of
+        insertion) and, if memo is True, the portable memoized properties. NumPy arrays among
+        them are stored as raw (8-byte aligned) buffers.
+        """
+        buffers = []
+        state = {name: value for name, value in self.memo.items() if name in PORTABLE_MEMO} if memo else {}
+        data = pickle.dumps(state, protocol=5, buffer_callback=buffers.append)
+        flat = [c for h in self.face_coordinates() for c in h]
+        parts = [BYTES_HEADER.pack(BYTES_MAGIC, len(self.face_dict), len(data), len(buffers)),
+                 struct.pack('<{0}Q'.format(len(buffers)), *(b.raw().nbytes for b in buffers)),
+                 struct.pack('<{0}i'.format(len(flat)), *flat), data]
+        for b in buffers:
+            parts.append(b'\x00' * (-sum(len(p) for p in parts) % 8))
+            parts.append(b.raw())
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Construct a benzenoid serialised by to_bytes. The graph is rebuilt from the hexagon
+        labels in one pass (see _add_hexagons) and the memoized properties are restored. If
+        data is a memoryview (e.g. of shared memory), NumPy arrays among memoized properties
+        are read-only views into it (no copy is made).
+
+        Note: The memoized properties are unpickled, so data must come from a trusted source.
+        """
+        data = memoryview(data)
+        magic, h, length, count = BYTES_HEADER.unpack_from(data)
+        if magic != BYTES_MAGIC:
+            raise ValueError('not a serialised benzenoid')
+        offset = BYTES_HEADER.size
+        sizes = struct.unpack_from('<{0}Q'.format(count), data, offset)
+        offset += 8 * count
+        flat = struct.unpack_from('<{0}i'.format(2 * h), data, offset)
+        offset += 8 * h
+        state = data[offset:offset + length]
+        offset += length
+        buffers = []
+        for size in sizes:
+            offset += -offset % 8
+            buffers.append(data[offset:offset + size].toreadonly())
+            offset += size
+        ret = cls()
+        ret._add_hexagons(zip(flat[::2], flat[1::2]))
+        ret.memo.update(pickle.loads(state, buffers=buffers))
+        return ret
 
+    def __reduce__(self):
+        return Benzenoid.from_bytes, (self.to_bytes(),)
+
+    def to_shared_memory(self, memo=True):
+        """
+        Copy the serialised benzenoid (see to_bytes) into a new block of shared memory and
+        return the multiprocessing.shared_memory.SharedMemory object; other processes pass its
+        name to from_shared_memory. The caller closes and unlinks the block when it is no
+        longer needed.
+        """
+        from multiprocessing import shared_memory
+        data = self.to_bytes(memo)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+        shm.buf[:len(data)] = data
+        return shm
+
+    @classmethod
+    def from_shared_memory(cls, name):
+        """
+        Construct a benzenoid from a block of shared memory created by to_shared_memory. The
+        block stays attached (as the attribute shared_memory) while the benzenoid refers to it.
+
+        Note: Before Python 3.13 attaching registers the block with the resource tracker of the
+        process. Worker processes started by multiprocessing share the tracker of their parent,
+        so this only duplicates the registration of the creator. Any other process has its own
+        tracker, which unlinks the block (and warns of a leak) when the process exits, so such a
+        process must not outlive its use of the block by others.
+        """
+        from multiprocessing import shared_memory
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:  # Python < 3.13, see the note above.
+            shm = shared_memory.SharedMemory(name=name)
+        ret = cls.from_bytes(shm.buf)
+        ret.shared_memory = shm
+        return ret
+
+    @memoized('faces', 'hole_cells')
     def empty_face_slots(self):
         """
         Return the set of face coordinates, that are not part of the benzenoid but are adjacent to it.
-        """
-        ret = set()
-        for e in self.perimeter():
-            ret.update(f for f in e.incident_faces_candidates() if f not in self.face_dict)
+
+        Note: Slots inside holes are not included.
+        """
+        if len(self.hole_cells()) == 0:
+            return set(self.frontier)
+        inside = {c for cells in self.hole_cells() for c in cells}
+        return {f for f in self.frontier if f not in inside}
+
+    def _evaluate_addition_by_copy(self, h, props):
+        """
+        Return the dictionary of properties (see evaluate_additions) of a copy of this
+        benzenoid with the hexagon h added.
+        """
+        b = self.copy()
+        b.add_hexagon(h)
+        methods = {'bec': b.boundary_edges_code, 'deficit': b.convex_deficit,
+                   'kekule': b.perfect_matchings, 'gap': b.homo_lumo_gap}
+        return {p: methods[p]() for p in props}
+
+    def evaluate_additions(self, props=('bec', 'deficit', 'kekule', 'gap')):
+        """
+        Return the dictionary that maps every slot of empty_face_slots() to the dictionary of
+        the given properties of the benzenoid obtained by adding a hexagon at that slot:
+        'bec' (boundary_edges_code), 'deficit' (convex_deficit), 'kekule' (perfect_matchings)
+        and 'gap' (homo_lumo_gap).
+
+        Note: If the occupied neighbours of a slot are consecutive, the new hexagon shares a
+        path of k edges with the perimeter. The path is replaced by 6 - k new edges, so the BEC
+        is spliced from the degrees along the perimeter. The graph gains 5 - k vertices attached
+        to the two ends of the path (or, for k = 5, an edge between them); only two rows of the
+        inverse of the current adjacency matrix A are involved. The Kekule count follows from
+        the Schur complement S(0) (determinant lemma) and the HOMO-LUMO gap from bisection on
+        the number of negative eigenvalues of A' - xI, which equals that of A - xI plus that of
+        the Schur complement S(x) (Haynsworth inertia additivity). A single eigendecomposition
+        of A is computed. Slots that close a hole (and, for 'kekule' and 'gap', all slots of
+        benzenoids with a singular A, e.g. with an odd number of vertices) are evaluated by a
+        full recomputation.
+        """
+        import numpy
+        unknown = set(props) - {'bec', 'deficit', 'kekule', 'gap'}
+        if len(unknown) > 0:
+            raise ValueError('unknown properties: {0}'.format(', '.join(sorted(unknown))))
+        if 'bec' in props or 'deficit' in props:
+            perimeter = self.perimeter_vertices()
+            degrees = ''.join(str(v.get_degree()) for v in perimeter)
+            position = {v.label: i for i, v in enumerate(perimeter)}
+        if 'kekule' in props or 'gap' in props:
+            eigvals, eigvecs = numpy.linalg.eigh(self.numpy_adjacency_matrix())
+            index = self.vertex_index()
+            kekule = self.perfect_matchings()
+            # The updates divide by eigenvalues of A - xI, bisection starts at x = 0.
+            singular = kekule == 0 or numpy.abs(eigvals).min() < 1e-9
+        n = len(self.vertex_dict)
+        ret = dict()
+        for slot in sorted(self.empty_face_slots()):
+            present = [f in self.face_dict for f in lattice.face_neighbours(slot)]
+            starts = [nu for nu in range(6) if present[nu] and not present[nu - 1]]
+            if len(starts) != 1 or (('kekule' in props or 'gap' in props) and singular):
+                ret[slot] = self._evaluate_addition_by_copy(slot, props)
+                continue
+            k = sum(present)
+            r = 5 - k  # Number of new vertices.
+            # The shared path runs from the vertex s = start - 1 to the vertex t = start + k - 1.
+            s = Vertex.canonical_label((slot[0], slot[1], (starts[0] - 1) % 6))
+            t = Vertex.canonical_label((slot[0], slot[1], (starts[0] + k - 1) % 6))
+            values = dict()
+
+            if 'bec' in props or 'deficit' in props:
+                i_s, i_t = position[s], position[t]
+                length = len(degrees)
+                if (i_s - i_t) % length == k:
+                    i_s, i_t = i_t, i_s
+                outer = (degrees + degrees)[i_t + 1:i_t + (i_s - i_t) % length]  # From t to s (exclusive).
+                bec = lattice.bec_from_degrees('3' + outer + '3' + '2' * r)
+                if 'bec' in props:
+                    values['bec'] = bec
+                if 'deficit' in props:
+                    values['deficit'] = lattice.convex_deficit(bec)
+
+            if 'kekule' in props or 'gap' in props:
+                q = eigvecs[[index[t], index[s]]]  # Rows of the two ends of the path.
+                # New vertices w_1, ..., w_r form a path; w_1 is adjacent to t and w_r to s.
+                path = numpy.eye(r, k=1) + numpy.eye(r, k=-1)
+                attach = numpy.zeros((2, r))
+                if r > 0:
+                    attach[0, 0] = attach[1, r - 1] = 1
+                swap = numpy.array([[0.0, 1.0], [1.0, 0.0]])
+
+                def schur(x):
+                    # G = U^T (A - xI)^-1 U for U = [e_t, e_s].
+                    g = (q / (eigvals - x)) @ q.T
+                    if r > 0:
+                        return path - x * numpy.eye(r) - attach.T @ g @ attach
+                    return -swap - g
+
+                def count_below(x):
+                    # Number of eigenvalues of the new adjacency matrix that are less than x.
+                    neg = int(numpy.searchsorted(eigvals, x)) + int((numpy.linalg.eigvalsh(schur(x)) < 0).sum())
+                    return neg if r > 0 else neg - 1  # -swap has one negative eigenvalue.
+
+                def eigenvalue(j):
+                    lo, hi = -3.5, 3.5
+                    for _ in range(60):
+                        mid = (lo + hi) / 2
+                        if count_below(mid) >= j + 1:
+                            hi = mid
+                        else:
+                            lo = mid
+                    return (lo + hi) / 2
+
+                if 'kekule' in props:
+                    if r > 0:
+                        ratio = numpy.linalg.det(schur(0.0))
+                    else:
+                        ratio = numpy.linalg.det(numpy.eye(2) + swap @ ((q / eigvals) @ q.T))
+                    values['kekule'] = int(round(kekule * abs(ratio) ** 0.5))
+                if 'gap' in props:
+                    size = n + r
+                    values['gap'] = 0.0 if size % 2 == 1 else eigenvalue(size // 2) - eigenvalue(size // 2 - 1)
+            ret[slot] = {p: values[p] for p in props}
         return ret
 
+    @memoized('boundary_edges_code')
     def is_convex(self):
         """
         Return True if and only if the benzenoid is convex.
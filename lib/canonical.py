@@ -0,0 +1,150 @@
+import hashlib
+import os
+import struct
+import tempfile
+
+import lib.lattice as lattice
+
+
+def symmetries(hexagons):
+    """
+    Make a generator object that will yield the images of the list of hexagons under all 12
+    symmetries of the hexagonal lattice that fix the origin (6 rotations, each optionally
+    composed with the reflection (xi, eta) -> (eta, xi)).
+    """
+    current = [tuple(h) for h in hexagons]
+    for _ in range(6):
+        yield current
+        yield [(eta, xi) for xi, eta in current]
+        current = [(-eta, xi + eta) for xi, eta in current]  # Rotation by 60 degrees.
+
+
+def canonical_form(hexagons):
+    """
+    Return the canonical form of the benzenoid given by the list of its hexagons as bytes.
+
+    Every image of the hexagon set under a lattice symmetry is translated so that its bounding
+    box starts at (0, 0), and each hexagon (xi, eta) is encoded as the integer xi * M + eta, where
+    M exceeds the extent of the benzenoid in all three lattice directions. The canonical form is
+    the lexicographically smallest sorted list of these integers, packed in big-endian order
+    after a header (M and the width of one entry in bytes). Two hexagon sets have equal canonical
+    forms if and only if one is mapped to the other by a lattice symmetry and a translation
+    (so holes are taken into account as well).
+    """
+    hexagons = [tuple(h) for h in hexagons]
+    if len(hexagons) == 0:
+        raise ValueError('the benzenoid is empty')
+    xis = [xi for xi, _ in hexagons]
+    etas = [eta for _, eta in hexagons]
+    sums = [xi + eta for xi, eta in hexagons]
+    m = max(max(xis) - min(xis), max(etas) - min(etas), max(sums) - min(sums)) + 1
+    best = None
+    for image in symmetries(hexagons):
+        xi_min = min(xi for xi, _ in image)
+        eta_min = min(eta for _, eta in image)
+        codes = sorted((xi - xi_min) * m + (eta - eta_min) for xi, eta in image)
+        if best is None or codes < best:
+            best = codes
+    width = 1 if m * m <= 1 << 8 else (2 if m * m <= 1 << 16 else (4 if m * m <= 1 << 32 else 8))
+    fmt = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}[width]
+    return struct.pack('>IB{0}{1}'.format(len(best), fmt), m, width, *best)
+
+
+def decode_canonical_form(form):
+    """
+    Return the list of hexagons encoded by a canonical form (see canonical_form).
+    """
+    m, width = struct.unpack_from('>IB', form)
+    fmt = {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}[width]
+    count = (len(form) - 5) // width
+    return [divmod(code, m) for code in struct.unpack_from('>{0}{1}'.format(count, fmt), form, 5)]
+
+
+def canonical_hash(hexagons, bits=64):
+    """
+    Return the hash (a non-negative integer with the given number of bits, a multiple of 8 up to
+    512) of the canonical form of the benzenoid given by the list of its hexagons.
+    """
+    digest = hashlib.blake2b(canonical_form(hexagons), digest_size=bits // 8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+def _dedup_key(hexagons, hash_size):
+    """
+    Return the hash of the benzenoid used by unique_benzenoids. For connected benzenoids
+    without holes it is the hash of the BEC (a complete invariant, traced in linear time);
+    otherwise it is the hash of the canonical form. The two kinds of keys never collide.
+    """
+    faces = set(tuple(h) for h in hexagons)
+    if lattice.is_connected(faces) and len(lattice.hole_cells(faces)) == 0:
+        data = b'B' + lattice.boundary_edges_code(faces).encode('ascii')
+    else:
+        data = b'F' + canonical_form(hexagons)
+    return hashlib.blake2b(data, digest_size=hash_size).digest()
+
+
+def _pack_hexagons(hexagons):
+    flat = [c for h in hexagons for c in h]
+    return struct.pack('>I{0}i'.format(len(flat)), len(flat), *flat)
+
+
+def _read_records(f, hash_size):
+    """
+    Make a generator object that will yield (hash, hexagons) pairs from a spill file.
+    """
+    while True:
+        head = f.read(hash_size + 4)
+        if len(head) < hash_size + 4:
+            return
+        key = head[:hash_size]
+        length, = struct.unpack('>I', head[hash_size:])
+        flat = struct.unpack('>{0}i'.format(length), f.read(4 * length))
+        yield key, list(zip(flat[::2], flat[1::2]))
+
+
+def unique_benzenoids(stream, bits=64, max_in_memory=10**7, spill_dir=None, partitions=256):
+    """
+    Make a generator object that will yield the benzenoids (lists of hexagons) from the stream
+    that are not isomorphic to any benzenoid yielded before.
+
+    Only hashes of canonical forms are kept in memory. Once more than max_in_memory distinct
+    hashes were seen, benzenoids with new hashes are written to partition files (selected by
+    the hash) in a temporary directory within spill_dir; each partition is deduplicated in
+    memory after the stream ends, so those benzenoids are yielded at the end.
+
+    Note: Benzenoids whose keys (see _dedup_key) have equal hashes are considered isomorphic. For
+    10^7 distinct benzenoids and 64-bit hashes the probability of a collision is about 3e-6;
+    use bits=128 to make it negligible.
+    """
+    hash_size = bits // 8
+    seen = set()
+    spill = None
+    files = None
+    try:
+        for hexagons in stream:
+            key = _dedup_key(hexagons, hash_size)
+            if key in seen:
+                continue
+            if len(seen) < max_in_memory:
+                seen.add(key)
+                yield hexagons
+                continue
+            if spill is None:
+                spill = tempfile.TemporaryDirectory(dir=spill_dir)
+                files = [open(os.path.join(spill.name, '{0}.bin'.format(i)), 'w+b') for i in range(partitions)]
+            files[int.from_bytes(key, 'big') % partitions].write(key + _pack_hexagons(hexagons))
+        if spill is None:
+            return
+        seen.clear()
+        for f in files:
+            f.seek(0)
+            partition_seen = set()
+            for key, hexagons in _read_records(f, hash_size):
+                if key not in partition_seen:
+                    partition_seen.add(key)
+                    yield hexagons
+    finally:
+        if spill is not None:
+            for f in files:
+                f.close()
+            spill.cleanup()
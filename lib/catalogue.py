@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+import struct
+
+import lib.canonical as canonical
+import lib.lattice as lattice
+
+# NumPy is imported inside the functions (see lib.benzenoids).
+
+
+MAGIC = b'BZCAT\x00\x01\x00'
+ALIGNMENT = 8
+
+
+def enumerate_benzenoids(max_h):
+    """
+    Make a generator object that will yield every benzenoid (as a list of hexagons) with at most
+    max_h hexagons exactly once up to lattice symmetries, in the order of increasing h.
+
+    Note: Benzenoids with holes are included. Every benzenoid with h + 1 hexagons is obtained
+    by adding a hexagon to a (connected) benzenoid with h hexagons, so each level is built from
+    the previous one and deduplicated by canonical forms.
+    """
+    level = [[(0, 0)]]
+    for h in range(1, max_h + 1):
+        for hexagons in level:
+            yield hexagons
+        if h == max_h:
+            return
+        forms = set()
+        for hexagons in level:
+            occupied = set(hexagons)
+            slots = {f for x in hexagons for f in lattice.face_neighbours(x) if f not in occupied}
+            for f in slots:
+                forms.add(canonical.canonical_form(hexagons + [f]))
+        level = [canonical.decode_canonical_form(form) for form in sorted(forms)]
+
+
+def benzenoid_record(benz):
+    """
+    Return the dictionary of invariants stored in the catalogue for a Benzenoid object.
+    """
+    return {
+        'bec': benz.boundary_edges_code(),
+        'h': benz.get_h(),
+        'n': benz.get_n(),
+        'm': benz.get_m(),
+        'deficit': benz.convex_deficit(),
+        'kekule': int(benz.perfect_matchings()),
+        'spectrum': [float(x) for x in benz.spectrum()],
+        'hexagons': sorted(benz.face_coordinates()),
+    }
+
+
+def _write_arrays(path, arrays, meta):
+    """
+    Write the dictionary of NumPy arrays into a single file: MAGIC, the length of the JSON
+    header, the header (dtype, shape and offset of every array) and aligned raw arrays.
+    """
+    columns = dict()
+    offset = 0
+    for name, array in arrays.items():
+        columns[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header = json.dumps({'meta': meta, 'columns': columns}).encode('utf-8')
+    start = -(-(len(MAGIC) + 8 + len(header)) // ALIGNMENT) * ALIGNMENT
+    with open(path, 'wb') as f:
+        f.write(MAGIC + struct.pack('<Q', len(header)) + header)
+        f.write(b'\x00' * (start - f.tell()))
+        for name, array in arrays.items():
+            f.write(array.tobytes())
+            f.write(b'\x00' * (-array.nbytes % ALIGNMENT))
+
+
+def build_catalogue(path, max_h, verbose=False):
+    """
+    Precompute all benzenoids without holes with at most max_h hexagons and write the catalogue
+    (sorted by canonical BEC) into the file path. Return the number of entries.
+
+    Note: Benzenoids with holes are left out, because their BEC does not determine them.
+    """
+    import numpy
+    import lib.benzenoids as bz
+    records = []
+    for hexagons in enumerate_benzenoids(max_h):
+        if len(lattice.hole_cells(set(hexagons))) > 0:
+            continue
+        records.append(benzenoid_record(bz.Benzenoid(hexagons)))
+        if verbose and len(records) % 10000 == 0:
+            print(len(records), 'benzenoids')
+    records.sort(key=lambda r: r['bec'])
+    width = max(len(r['bec']) for r in records)
+    arrays = {
+        'bec': numpy.array([r['bec'].encode('ascii') for r in records], dtype='S{0}'.format(width)),
+        'h': numpy.array([r['h'] for r in records], dtype='<i4'),
+        'n': numpy.array([r['n'] for r in records], dtype='<i4'),
+        'm': numpy.array([r['m'] for r in records], dtype='<i4'),
+        'deficit': numpy.array([r['deficit'] for r in records], dtype='<i4'),
+        'kekule': numpy.array([r['kekule'] for r in records], dtype='<i8'),
+        'spectrum': numpy.array([x for r in records for x in r['spectrum']], dtype='<f8'),
+        'spectrum_offsets': numpy.cumsum([0] + [len(r['spectrum']) for r in records], dtype='<i8'),
+        'hexagons': numpy.array([h for r in records for h in r['hexagons']], dtype='<i4').reshape(-1, 2),
+        'hexagons_offsets': numpy.cumsum([0] + [len(r['hexagons']) for r in records], dtype='<i8'),
+    }
+    _write_arrays(path, arrays, {'max_h': max_h, 'count': len(records)})
+    return len(records)
+
+
+class Catalogue(object):
+
+    def __init__(self, path):
+        """
+        Open a catalogue written by build_catalogue. The file is memory-mapped read-only, so
+        opening it costs no parsing and all processes share the same pages.
+        """
+        import numpy
+        self.data = numpy.memmap(path, dtype=numpy.uint8, mode='r')
+        if bytes(self.data[:len(MAGIC)]) != MAGIC:
+            raise ValueError('{0} is not a benzenoid catalogue'.format(path))
+        length, = struct.unpack('<Q', bytes(self.data[len(MAGIC):len(MAGIC) + 8]))
+        header = json.loads(bytes(self.data[len(MAGIC) + 8:len(MAGIC) + 8 + length]).decode('utf-8'))
+        start = -(-(len(MAGIC) + 8 + length) // ALIGNMENT) * ALIGNMENT
+        self.meta = header['meta']
+        self.columns = dict()
+        for name, info in header['columns'].items():
+            dtype = numpy.dtype(info['dtype'])
+            shape = tuple(info['shape'])
+            size = int(numpy.prod(shape)) * dtype.itemsize
+            begin = start + info['offset']
+            self.columns[name] = self.data[begin:begin + size].view(dtype).reshape(shape)
+
+    def __len__(self):
+        return len(self.columns['bec'])
+
+    def find(self, bec):
+        """
+        Return the index of the entry with the given boundary-edges code (not necessarily in the
+        canonical form), or None if there is no such entry.
+        """
+        import numpy
+        if len(bec) == 0 or not bec.isdigit():
+            return None
+        key = lattice.canonical_bec(bec).encode('ascii')
+        becs = self.columns['bec']
+        if len(key) > becs.dtype.itemsize:
+            return None
+        i = int(numpy.searchsorted(becs, key))
+        if i < len(becs) and becs[i] == key:
+            return i
+        return None
+
+    def record(self, i):
+        """
+        Return the dictionary of invariants of the i-th entry (see benzenoid_record).
+        """
+        c = self.columns
+        return {
+            'bec': c['bec'][i].decode('ascii'),
+            'h': int(c['h'][i]),
+            'n': int(c['n'][i]),
+            'm': int(c['m'][i]),
+            'deficit': int(c['deficit'][i]),
+            'kekule': int(c['kekule'][i]),
+            'spectrum': c['spectrum'][c['spectrum_offsets'][i]:c['spectrum_offsets'][i + 1]].tolist(),
+            'hexagons': [tuple(h) for h in c['hexagons'][c['hexagons_offsets'][i]:c['hexagons_offsets'][i + 1]].tolist()],
+        }
+
+    def lookup(self, bec):
+        """
+        Return the dictionary of invariants of the benzenoid with the given boundary-edges code,
+        or None if it is not in the catalogue.
+        """
+        i = self.find(bec)
+        return None if i is None else self.record(i)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the catalogue of small benzenoids.')
+    parser.add_argument('--max-h', type=int, default=10, help='maximum number of hexagons')
+    parser.add_argument('-o', '--output', default=os.path.join('data', 'catalogue.bin'), help='output file')
+    args = parser.parse_args()
+    if os.path.dirname(args.output) != '':
+        os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    print(build_catalogue(args.output, args.max_h, verbose=True), 'benzenoids written to', args.output)
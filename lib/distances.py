@@ -0,0 +1,177 @@
+import lib.algorithms as algorithms
+
+# NumPy is imported inside the functions (see lib.benzenoids).
+
+
+def neighbour_table(indptr, indices, max_degree=3):
+    """
+    Return the n x max_degree array of neighbours of vertices (given by a CSR adjacency matrix),
+    padded with n (an index of a virtual vertex that is never reached).
+    """
+    import numpy
+    n = len(indptr) - 1
+    degrees = numpy.diff(indptr)
+    if n > 0 and degrees.max() > max_degree:
+        raise ValueError('maximum degree exceeds {0}'.format(max_degree))
+    table = numpy.full((n, max_degree), n, dtype=numpy.int64)
+    rows = numpy.repeat(numpy.arange(n), degrees)
+    cols = numpy.arange(len(indices)) - numpy.repeat(indptr[:-1], degrees)
+    table[rows, cols] = indices
+    return table
+
+
+def _popcount(words):
+    import numpy
+    if hasattr(numpy, 'bitwise_count'):
+        return int(numpy.bitwise_count(words).sum())
+    return int(numpy.unpackbits(words.view(numpy.uint8)).sum())
+
+
+def bfs_levels(table, sources):
+    """
+    Make a generator object that will yield pairs (d, new) for d = 1, 2, ..., where new is an
+    n x ceil(len(sources) / 64) array of 64-bit words: bit j of row v is set if and only if
+    the distance between sources[j] and v equals d.
+
+    Note: All sources are processed at once (bit-parallel breadth first search).
+    """
+    import numpy
+    n = len(table)
+    words = (len(sources) + 63) // 64
+    frontier = numpy.zeros((n + 1, words), dtype=numpy.uint64)  # Row n stays empty.
+    j = numpy.arange(len(sources))
+    frontier[sources, j // 64] |= numpy.left_shift(numpy.uint64(1), (j % 64).astype(numpy.uint64))
+    visited = frontier[:n].copy()
+    d = 0
+    while True:
+        reached = frontier[table[:, 0]]
+        for k in range(1, table.shape[1]):
+            reached |= frontier[table[:, k]]
+        new = reached & ~visited
+        if not new.any():
+            return
+        d += 1
+        visited |= new
+        frontier[:n] = new
+        yield d, new
+
+
+def distance_rows(indptr, indices, block_size=256):
+    """
+    Make a generator object that will yield pairs (start, rows), where rows is the block of rows
+    start, start + 1, ... of the distance matrix (as a NumPy array). Unreachable vertices are at
+    distance -1. Only one block is kept in memory at a time.
+    """
+    import numpy
+    table = neighbour_table(indptr, indices)
+    n = len(table)
+    for start in range(0, n, block_size):
+        sources = numpy.arange(start, min(start + block_size, n))
+        rows = numpy.full((len(sources), n), -1, dtype=numpy.int32)
+        rows[numpy.arange(len(sources)), sources] = 0
+        for d, new in bfs_levels(table, sources):
+            bits = numpy.unpackbits(new.view(numpy.uint8), axis=1, bitorder='little')[:, :len(sources)]
+            rows.T[bits.astype(bool)] = d
+        yield start, rows
+
+
+def distance_matrix(indptr, indices, block_size=256):
+    """
+    Return the distance matrix (as a NumPy array).
+    """
+    import numpy
+    n = len(indptr) - 1
+    ret = numpy.empty((n, n), dtype=numpy.int32)
+    for start, rows in distance_rows(indptr, indices, block_size):
+        ret[start:start + len(rows)] = rows
+    return ret
+
+
+def wiener_index_bfs(indptr, indices, block_size=1024):
+    """
+    Return the Wiener index (the sum of distances between all pairs of vertices) of a connected
+    graph using bit-parallel breadth first searches; memory is O(n * block_size / 64) words.
+    """
+    import numpy
+    table = neighbour_table(indptr, indices)
+    n = len(table)
+    total = 0
+    for start in range(0, n, block_size):
+        sources = numpy.arange(start, min(start + block_size, n))
+        for d, new in bfs_levels(table, sources):
+            total += d * _popcount(new)
+    return total // 2
+
+
+def szeged_index_bfs(indptr, indices, edges, block_size=256):
+    """
+    Return the Szeged index (the sum of n_u(e) * n_v(e) over all edges e = uv, where n_u(e) is the
+    number of vertices closer to u than to v) of a graph with the given m x 2 array of edges.
+    """
+    import numpy
+    closer_u = numpy.zeros(len(edges), dtype=numpy.int64)
+    closer_v = numpy.zeros(len(edges), dtype=numpy.int64)
+    for start, rows in distance_rows(indptr, indices, block_size):
+        du, dv = rows[:, edges[:, 0]], rows[:, edges[:, 1]]
+        closer_u += (du < dv).sum(axis=0)
+        closer_v += (dv < du).sum(axis=0)
+    return int((closer_u * closer_v).sum())
+
+
+def cut_indices(n, edges, classes):
+    """
+    Return the pair (Wiener index, Szeged index) computed by the cut method, or None if the
+    method does not apply.
+
+    The edges (an m x 2 array of vertex indices) are split into classes of parallel edges. For
+    each class, contracting all edges of the other classes gives a quotient graph whose edges are
+    elementary cuts. In a benzenoid (without holes) the quotient graph is a tree, and a cut C
+    separating n1 and n2 vertices contributes n1 * n2 to the Wiener index and |C| * n1 * n2 to the
+    Szeged index (Klavzar, Gutman and Mohar; Chepoi and Klavzar). The running time is O(m alpha(n))
+    per class.
+    """
+    wiener, szeged = 0, 0
+    for c in sorted(set(int(x) for x in classes)):
+        forest = algorithms.UnionFind()
+        for v in range(n):
+            forest.add(v)
+        cut_edges = []
+        for (u, v), k in zip(edges.tolist(), classes.tolist()):
+            if k == c:
+                cut_edges.append((u, v))
+            else:
+                forest.union(u, v)
+        weight = {root: forest.size[root] for root in set(forest.find(v) for v in range(n))}
+        multiplicity = dict()
+        for u, v in cut_edges:
+            key = tuple(sorted((forest.find(u), forest.find(v))))
+            if key[0] == key[1]:
+                return None  # The quotient graph has a loop.
+            multiplicity[key] = multiplicity.get(key, 0) + 1
+        if len(multiplicity) != len(weight) - 1:
+            return None  # The quotient graph is not a tree.
+        tree = {root: [] for root in weight}
+        for a, b in multiplicity:
+            tree[a].append(b)
+            tree[b].append(a)
+        root = next(iter(tree))
+        order = algorithms.dfs(root, neighbors=lambda w: tree[w])
+        if len(order) != len(tree):
+            return None
+        # Sizes of subtrees (vertices are processed in reverse DFS order).
+        parent = {root: None}
+        for w in order:
+            for x in tree[w]:
+                if x not in parent:
+                    parent[x] = w
+        subtree = dict(weight)
+        for w in reversed(order):
+            if parent[w] is not None:
+                subtree[parent[w]] += subtree[w]
+        for w in order:
+            if parent[w] is not None:
+                n1 = subtree[w]
+                size = multiplicity[tuple(sorted((w, parent[w])))]
+                wiener += n1 * (n - n1)
+                szeged += size * n1 * (n - n1)
+    return wiener, szeged
@@ -0,0 +1,267 @@
+import json
+import math
+import os
+import struct
+
+import lib.lattice as lattice
+
+# NumPy is imported inside the functions (see lib.benzenoids).
+
+
+# Invariants that can be stored in an archive: name -> (dtype, Benzenoid method).
+# Strings are stored as UTF-8 bytes with an offsets index.
+INVARIANTS = {
+    'bec': ('str', 'boundary_edges_code'),
+    'deficit': ('int32', 'convex_deficit'),
+    'kekule': ('float64', 'perfect_matchings'),
+    'wiener': ('int64', 'wiener_index'),
+    'szeged': ('int64', 'szeged_index'),
+}
+
+# Geometry columns (ragged, indexed by offsets): name -> (dtype, number of values per row).
+GEOMETRY = {
+    'hexagons': ('int32', 2),
+    'vertices': ('float64', 2),
+    'edges': ('int32', 2),
+}
+
+
+def write_archive(path, benzenoids, invariants=('bec', 'deficit'), edge_length=1.4):
+    """
+    Write the benzenoids (Benzenoid objects or lists of hexagons) into the directory path as a
+    columnar archive of raw little-endian arrays:
+     - hexagons, vertices (cartesian coordinates) and edges (pairs of indices of vertices within
+       the same benzenoid) with the offsets of every benzenoid in <name>_offsets,
+     - the number of hexagons, vertices and edges (h, n, m),
+     - the requested invariants (see INVARIANTS).
+    The file manifest.json describes the dtype and shape of every array. Benzenoids are
+    processed one at a time and appended to the files, so the input may be a generator.
+    Return the number of written benzenoids.
+    """
+    import numpy
+    for name in invariants:
+        if name not in INVARIANTS:
+            raise ValueError('unknown invariant {0!r}'.format(name))
+    os.makedirs(path, exist_ok=True)
+    columns = dict()
+    for name, (dtype, width) in GEOMETRY.items():
+        columns[name] = (dtype, width)
+        columns[name + '_offsets'] = ('int64', 1)
+    for name in ('h', 'n', 'm'):
+        columns[name] = ('int32', 1)
+    for name in invariants:
+        dtype = INVARIANTS[name][0]
+        if dtype == 'str':
+            columns[name] = ('uint8', 1)
+            columns[name + '_offsets'] = ('int64', 1)
+        else:
+            columns[name] = (dtype, 1)
+    files = {name: open(os.path.join(path, name + '.bin'), 'wb') for name in columns}
+    lengths = {name: 0 for name in columns}
+
+    def append(name, values):
+        dtype, _ = columns[name]
+        data = numpy.ascontiguousarray(values, dtype=numpy.dtype(dtype).newbyteorder('<'))
+        files[name].write(data.tobytes())
+        lengths[name] += data.size
+
+    try:
+        for name in columns:
+            if name.endswith('_offsets'):
+                append(name, [0])
+        count = 0
+        for benzenoid in benzenoids:
+            hexagons = lattice.hexagon_list(benzenoid)
+            vertices, _, endpoints = lattice.graph_arrays(hexagons)
+            append('hexagons', hexagons)
+            append('vertices', lattice.vertex_coordinates(vertices, edge_length))
+            append('edges', endpoints)
+            for name in GEOMETRY:
+                append(name + '_offsets', [lengths[name] // GEOMETRY[name][1]])
+            append('h', [len(hexagons)])
+            append('n', [len(vertices)])
+            append('m', [len(endpoints)])
+            if len(invariants) > 0:
+                if not hasattr(benzenoid, 'face_coordinates'):
+                    import lib.benzenoids as bz
+                    benzenoid = bz.Benzenoid(hexagons)
+                for name in invariants:
+                    dtype, method = INVARIANTS[name]
+                    value = getattr(benzenoid, method)()
+                    if dtype == 'str':
+                        append(name, numpy.frombuffer(str(value).encode('utf-8'), dtype=numpy.uint8))
+                        append(name + '_offsets', [lengths[name]])
+                    else:
+                        append(name, [value])
+            count += 1
+    finally:
+        for f in files.values():
+            f.close()
+
+    manifest = {
+        'format': 'benzenoid-archive',
+        'version': 1,
+        'count': count,
+        'invariants': list(invariants),
+        'columns': {name: {'dtype': dtype, 'shape': [lengths[name] // width] + ([width] if width > 1 else [])}
+                    for name, (dtype, width) in columns.items()},
+    }
+    with open(os.path.join(path, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=1)
+    return count
+
+
+class Archive(object):
+
+    def __init__(self, path):
+        """
+        Open an archive written by write_archive. All arrays are memory-mapped (read-only).
+        """
+        import numpy
+        with open(os.path.join(path, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+        self.invariants = self.manifest['invariants']
+        self.columns = dict()
+        for name, info in self.manifest['columns'].items():
+            dtype = numpy.dtype(info['dtype']).newbyteorder('<')
+            shape = tuple(info['shape'])
+            if shape[0] == 0:
+                self.columns[name] = numpy.zeros(shape, dtype=dtype)
+            else:
+                self.columns[name] = numpy.memmap(os.path.join(path, name + '.bin'), dtype=dtype,
+                                                  mode='r', shape=shape)
+
+    def __len__(self):
+        return self.manifest['count']
+
+    def _ragged(self, name, i):
+        offsets = self.columns[name + '_offsets']
+        return self.columns[name][offsets[i]:offsets[i + 1]]
+
+    def hexagons(self, i):
+        """
+        Return the array of hexagons of the i-th benzenoid.
+        """
+        return self._ragged('hexagons', i)
+
+    def vertices(self, i):
+        """
+        Return the array of coordinates of vertices of the i-th benzenoid.
+        """
+        return self._ragged('vertices', i)
+
+    def edges(self, i):
+        """
+        Return the array of edges (pairs of indices into vertices(i)) of the i-th benzenoid.
+        """
+        return self._ragged('edges', i)
+
+    def column(self, name):
+        """
+        Return the (memory-mapped) array of a scalar invariant (h, n, m, deficit, ...).
+        """
+        if name in INVARIANTS and INVARIANTS[name][0] == 'str':
+            raise ValueError('{0!r} is a string column; use value()'.format(name))
+        return self.columns[name]
+
+    def value(self, name, i):
+        """
+        Return the value of an invariant of the i-th benzenoid.
+        """
+        if name in INVARIANTS and INVARIANTS[name][0] == 'str':
+            return bytes(self._ragged(name, i)).decode('utf-8')
+        return self.columns[name][i].item()
+
+    def __getitem__(self, i):
+        """
+        Return the dictionary with hexagons, geometry and invariants of the i-th benzenoid.
+        """
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('index out of range')
+        ret = {'hexagons': self.hexagons(i), 'vertices': self.vertices(i), 'edges': self.edges(i)}
+        for name in ['h', 'n', 'm'] + self.invariants:
+            ret[name] = self.value(name, i)
+        return ret
+
+
+def _clockwise_neighbours(hexagons):
+    """
+    Return the number of vertices and the list of neighbours (in clockwise order) of every
+    vertex of the benzenoid.
+    """
+    vertices, _, endpoints = lattice.graph_arrays(hexagons)
+    coords = lattice.vertex_coordinates(vertices).tolist()
+    neighbours = [[] for _ in range(len(vertices))]
+    for u, v in endpoints.tolist():
+        neighbours[u].append(v)
+        neighbours[v].append(u)
+    for u, neigh in enumerate(neighbours):
+        x, y = coords[u]
+        neigh.sort(key=lambda w: -math.atan2(coords[w][1] - y, coords[w][0] - x))
+    return len(vertices), neighbours
+
+
+def planar_code(hexagons):
+    """
+    Return the planar code (without the header) of the benzenoid given by the list of its hexagons.
+
+    Note: For more than 255 vertices the code starts with 0 and all entries are unsigned
+    little-endian shorts (the header of such files is '>>planar_code le<<').
+    """
+    n, neighbours = _clockwise_neighbours(hexagons)
+    entries = [n]
+    for neigh in neighbours:
+        entries.extend(w + 1 for w in neigh)
+        entries.append(0)
+    if n <= 255:
+        return bytes(entries)
+    return b'\x00' + struct.pack('<{0}H'.format(len(entries)), *entries)
+
+
+def write_planar_code(f, benzenoids):
+    """
+    Write the benzenoids (Benzenoid objects or lists of hexagons) to the binary file f in the
+    planar code format. Return the number of written benzenoids.
+    """
+    f.write(b'>>planar_code le<<')
+    count = 0
+    for benzenoid in benzenoids:
+        f.write(planar_code(lattice.hexagon_list(benzenoid)))
+        count += 1
+    return count
+
+
+def graph6(hexagons):
+    """
+    Return the graph6 string (as bytes, without the newline) of the benzenoid given by the list
+    of its hexagons (vertices are numbered as in Benzenoid.vertex_index).
+    """
+    import numpy
+    vertices, _, endpoints = lattice.graph_arrays(hexagons)
+    n = len(vertices)
+    if n <= 62:
+        head = bytes([n + 63])
+    elif n <= 258047:
+        head = b'~' + bytes(((n >> s) & 63) + 63 for s in (12, 6, 0))
+    else:
+        head = b'~~' + bytes(((n >> s) & 63) + 63 for s in (30, 24, 18, 12, 6, 0))
+    # Bits of the upper triangle in the order (0,1), (0,2), (1,2), (0,3), (1,3), (2,3), ...
+    i, j = numpy.sort(endpoints, axis=1).T
+    bits = numpy.zeros(-(-(n * (n - 1) // 2) // 6) * 6, dtype=numpy.uint8)
+    bits[j * (j - 1) // 2 + i] = 1
+    values = bits.reshape(-1, 6) @ numpy.array([32, 16, 8, 4, 2, 1], dtype=numpy.uint8) + 63
+    return head + values.astype(numpy.uint8).tobytes()
+
+
+def write_graph6(f, benzenoids):
+    """
+    Write the benzenoids (Benzenoid objects or lists of hexagons) to the binary file f in the
+    graph6 format (one graph per line). Return the number of written benzenoids.
+    """
+    count = 0
+    for benzenoid in benzenoids:
+        f.write(graph6(lattice.hexagon_list(benzenoid)) + b'\n')
+        count += 1
+    return count
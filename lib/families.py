@@ -0,0 +1,63 @@
+import random
+
+import lib.lattice as lattice
+
+
+def linear_acene(k):
+    """
+    Return the list of hexagons of the linear acene with k hexagons.
+    """
+    return [(i, 0) for i in range(k)]
+
+
+def parallelogram(a, b):
+    """
+    Return the list of hexagons of the a x b parallelogram (for a == b a rhombus).
+    """
+    return [(i, j) for j in range(b) for i in range(a)]
+
+
+def hexagonal(k):
+    """
+    Return the list of hexagons of the hexagonal benzenoid with side k (k = 1 is benzene,
+    k = 2 is coronene, ...).
+    """
+    return [(i, j) for j in range(-k + 1, k) for i in range(-k + 1, k)
+            if lattice.hex_distance((i, j), (0, 0)) < k]
+
+
+def triangular(k):
+    """
+    Return the list of hexagons of the triangular benzenoid with side k.
+    """
+    return [(i, j) for j in range(k) for i in range(k - j)]
+
+
+def coronoid(k, width=1):
+    """
+    Return the list of hexagons of a ring of the given width around a hexagonal hole
+    of side k. (For k = 1 the hole is a single hexagon and the graph equals the one of a
+    hexagonal benzenoid.)
+    """
+    return [(i, j) for i, j in hexagonal(k + width) if lattice.hex_distance((i, j), (0, 0)) >= k]
+
+
+def random_growth(h, seed=None):
+    """
+    Return the list of hexagons of a random benzenoid with h hexagons grown by adding,
+    one by one, a hexagon chosen uniformly among the empty slots adjacent to it.
+
+    Note: The benchmark family 'random' is generated here, so the sequence of hexagons for a
+    given seed must not change (lib.sampling is the faster sampler for large h).
+    """
+    rng = random.Random(seed)
+    hexagons = [(0, 0)]
+    occupied = {(0, 0)}
+    frontier = set(lattice.FACE_NEIGHBOURS)
+    while len(hexagons) < h:
+        new = rng.choice(sorted(frontier))
+        hexagons.append(new)
+        occupied.add(new)
+        frontier.discard(new)
+        frontier.update(f for f in lattice.face_neighbours(new) if f not in occupied)
+    return hexagons
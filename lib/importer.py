@@ -1,4 +1,19 @@
+import collections
+import math
+import mmap
+import os
+import re
+import struct
 
+import lib.lattice as lattice
+
+# NumPy is imported inside the functions (see lib.benzenoids).
+
+
+# One item of a bulk import: position is the line number of the record (or its index in a
+# binary file), source is the raw text of the record, and exactly one of hexagons (the list of
+# hexagons) and error (the error message) is not None.
+Record = collections.namedtuple('Record', ['position', 'source', 'hexagons', 'error'])
 
 def bec_to_hex_list(bec):
     """
@@ -12,6 +27,8 @@ def bec_to_hex_list(bec):
 
     if bec == '6':  # Benzene is an exception.
         return [(0, 0)]
+    if len(bec) == 0 or any(c not in '12345' for c in bec):
+        raise ValueError('a boundary-edges code consists of digits 1 to 5 (or is 6)')
 
     vert_lines = {}
 
@@ -45,12 +62,15 @@ def bec_to_hex_list(bec):
         # We arrived at a 3-valent vertex.
         dir = (dir - 1 + 3) % 3
     # print(vx, vy)
+    if (vx, vy, dir) != (0, 0, 0):
+        raise ValueError('the boundary-edges code does not describe a closed boundary')
 
     hex_list = []
 
     for hy, lst in vert_lines.items():
         lst.sort()
-        assert len(lst) % 2 == 0
+        if len(lst) % 2 != 0:
+            raise ValueError('the boundary-edges code does not describe a benzenoid')
         for i in range(0, len(lst) - 1, 2):
             left, right = lst[i], lst[i+1]
             for k in range(left, right):
@@ -58,6 +78,281 @@ def bec_to_hex_list(bec):
 
     return hex_list
 
+
+_COORDINATES = re.compile(r'^\s*\[?\s*(\(\s*-?\d+\s*,\s*-?\d+\s*\)\s*(,\s*\(\s*-?\d+\s*,\s*-?\d+\s*\)\s*)*)?,?\s*\]?\s*$')
+_INTEGER = re.compile(r'-?\d+')
+
+
+def parse_coordinates(text):
+    """
+    Return the list of hexagons given by a string such as '[(0, 0), (-2, 1), (-1, 0)]' (the
+    brackets are optional).
+    """
+    if _COORDINATES.match(text) is None:
+        raise ValueError('invalid list of coordinates: {0!r}'.format(text[:80]))
+    numbers = [int(x) for x in _INTEGER.findall(text)]
+    if len(numbers) == 0:
+        raise ValueError('empty list of coordinates')
+    return list(zip(numbers[::2], numbers[1::2]))
+
+
+def graph_to_hex_list(neighbours):
+    """
+    Return the list of hexagons of the benzenoid given by a plane graph, i.e. by the lists of
+    neighbours of vertices 0, ..., n-1 in the cyclic order around each vertex.
+
+    The faces of the embedding are traced and the hexagonal ones are placed in the lattice by
+    walking across shared edges. The result is unique up to a lattice symmetry.
+
+    Note: A hole consisting of a single hexagon cannot be told apart from a hexagon, so it is
+    filled in.
+    """
+    position = [{w: i for i, w in enumerate(neigh)} for neigh in neighbours]
+    for u, neigh in enumerate(neighbours):
+        for w in neigh:
+            if u not in position[w]:
+                raise ValueError('the graph is not symmetric ({0} -> {1})'.format(u, w))
+    # Trace faces: the dart (u, v) is followed by (v, w), where w follows u around v.
+    face_of = dict()
+    faces = []
+    for u, neigh in enumerate(neighbours):
+        for v in neigh:
+            if (u, v) in face_of:
+                continue
+            darts = []
+            while (u, v) not in face_of:
+                face_of[(u, v)] = len(faces)
+                darts.append((u, v))
+                u, v = v, neighbours[v][(position[v][u] + 1) % len(neighbours[v])]
+            faces.append(darts)
+    hexagonal = [i for i, darts in enumerate(faces) if len(darts) == 6]
+    if len(faces) == 2 and len(hexagonal) == 2:
+        hexagonal = hexagonal[:1]  # Benzene: one of the faces is the outer face.
+    hexagonal = set(hexagonal)
+    if len(hexagonal) == 0:
+        raise ValueError('the graph has no hexagonal face')
+    # Place hexagons: the k-th dart of the first face gets the edge label nu = k.
+    start = min(hexagonal)
+    label = {start: ((0, 0), 0)}  # Face -> (hexagon, nu of its first dart).
+    queue = collections.deque([start])
+    while len(queue) > 0:
+        f = queue.popleft()
+        (xi, eta), nu0 = label[f]
+        for k, (u, v) in enumerate(faces[f]):
+            g = face_of[(v, u)]
+            if g not in hexagonal:
+                continue
+            nu = (nu0 + k) % 6
+            d_xi, d_eta = lattice.FACE_NEIGHBOURS[nu]
+            placed = ((xi + d_xi, eta + d_eta), ((nu + 3) % 6 - faces[g].index((v, u))) % 6)
+            if g not in label:
+                label[g] = placed
+                queue.append(g)
+            elif label[g] != placed:
+                raise ValueError('the graph is not a subgraph of the hexagonal lattice')
+    if len(label) != len(hexagonal):
+        raise ValueError('the hexagons are not connected')
+    hexagons = sorted(h for h, _ in label.values())
+    if len(set(hexagons)) != len(hexagons):
+        raise ValueError('the graph is not a subgraph of the hexagonal lattice')
+    vertices, _, endpoints = lattice.graph_arrays(hexagons)
+    if len(vertices) != len(neighbours) or 2 * len(endpoints) != sum(len(neigh) for neigh in neighbours):
+        raise ValueError('the graph is not a benzenoid')
+    return hexagons
+
+
+def _lines(path):
+    """
+    Make a generator object that will yield pairs (line number, line as bytes) of a file that
+    is read through a memory map.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start, number, size = 0, 0, len(mm)
+            while start < size:
+                end = mm.find(b'\n', start)
+                if end == -1:
+                    end = size
+                number += 1
+                yield number, mm[start:end].rstrip(b'\r')
+                start = end + 1
+
+
+def _records(path, parse):
+    """
+    Make a generator object that will yield a Record for every non-empty line (that does not
+    start with '#') of a text file, parsed by the given function.
+    """
+    for number, line in _lines(path):
+        text = line.decode('utf-8', errors='replace').strip()
+        if len(text) == 0 or text.startswith('#'):
+            continue
+        try:
+            yield Record(number, text, parse(text), None)
+        except (ValueError, IndexError, KeyError) as error:
+            yield Record(number, text, None, str(error))
+
+
+def read_bec(path):
+    """
+    Make a generator object that will yield a Record for each boundary-edges code (one per
+    line) in the file.
+    """
+    return _records(path, bec_to_hex_list)
+
+
+def read_coordinates(path):
+    """
+    Make a generator object that will yield a Record for each list of coordinates of hexagons
+    (one per line, see parse_coordinates) in the file.
+    """
+    return _records(path, parse_coordinates)
+
+
+def _myrvold_hexagons(lines):
+    coords, neighbours = [], []
+    for line in lines:
+        fields = line.split()
+        x, y, degree = float(fields[0]), float(fields[1]), int(fields[2])
+        neigh = [int(w) for w in fields[3:]]
+        if len(neigh) != degree:
+            raise ValueError('wrong number of neighbours of vertex {0}'.format(len(coords)))
+        coords.append((x, y))
+        neighbours.append(neigh)
+    for u, neigh in enumerate(neighbours):
+        x, y = coords[u]
+        neigh.sort(key=lambda w: -math.atan2(coords[w][1] - y, coords[w][0] - x))  # Clockwise.
+    return graph_to_hex_list(neighbours)
+
+
+def read_myrvold(path):
+    """
+    Make a generator object that will yield a Record for each graph in Wendy Myrvold's format
+    (see Benzenoid.myrvold_format) in the file; graphs follow each other. The cyclic order of
+    neighbours is taken from the coordinates of vertices.
+    """
+    lines = _lines(path)
+    for number, line in lines:
+        text = line.decode('utf-8', errors='replace').strip()
+        if len(text) == 0 or text.startswith('#'):
+            continue
+        try:
+            n = int(text)
+        except ValueError:
+            yield Record(number, text, None, 'expected the number of vertices')
+            continue
+        block = [line.decode('utf-8', errors='replace') for _, (_, line) in zip(range(n), lines)]
+        source = '\n'.join([text] + block)
+        if len(block) < n:
+            yield Record(number, source, None, 'unexpected end of file')
+            return
+        try:
+            yield Record(number, source, _myrvold_hexagons(block), None)
+        except (ValueError, IndexError) as error:
+            yield Record(number, source, None, str(error))
+
+
+def read_planar_code(path):
+    """
+    Make a generator object that will yield a Record for each graph in the planar code file
+    (with the header '>>planar_code<<', '>>planar_code le<<' or '>>planar_code be<<'; the
+    byte order of the first one is little-endian). The position of a record is its index
+    (starting at 1) and the source is its byte offset.
+
+    Note: A truncated graph ends the stream with an error record.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            order = '<'
+            offset = 0
+            for header, byte_order in [(b'>>planar_code<<', '<'), (b'>>planar_code le<<', '<'),
+                                       (b'>>planar_code be<<', '>')]:
+                if mm[:len(header)] == header:
+                    order, offset = byte_order, len(header)
+            size = len(mm)
+            index = 0
+            while offset < size:
+                index += 1
+                start = offset
+                try:
+                    if mm[offset] != 0:
+                        n = mm[offset]
+                        offset += 1
+                        neighbours = []
+                        for _ in range(n):
+                            end = mm.find(b'\x00', offset)
+                            if end == -1:
+                                raise IndexError('unexpected end of file')
+                            neighbours.append([w - 1 for w in mm[offset:end]])
+                            offset = end + 1
+                    else:
+                        n, = struct.unpack_from(order + 'H', mm, offset + 1)
+                        offset += 3
+                        neighbours = [[]]
+                        while len(neighbours) <= n:
+                            w, = struct.unpack_from(order + 'H', mm, offset)
+                            offset += 2
+                            if w == 0:
+                                neighbours.append([])
+                            else:
+                                neighbours[-1].append(w - 1)
+                        neighbours.pop()
+                except (IndexError, struct.error) as error:
+                    yield Record(index, start, None, str(error) or 'unexpected end of file')
+                    return
+                try:
+                    yield Record(index, start, graph_to_hex_list(neighbours), None)
+                except (ValueError, IndexError) as error:
+                    yield Record(index, start, None, str(error))
+
+
+READERS = {
+    'bec': read_bec,
+    'coordinates': read_coordinates,
+    'myrvold': read_myrvold,
+    'planar_code': read_planar_code,
+}
+
+
+def read_benzenoids(path, file_format='bec'):
+    """
+    Make a generator object that will yield a Record for each benzenoid in the file in the
+    given format (see READERS).
+    """
+    if file_format not in READERS:
+        raise ValueError('unknown format {0!r}'.format(file_format))
+    return READERS[file_format](path)
+
+
+def chunks(records, chunk_size=100000):
+    """
+    Make a generator object that will yield tuples (positions, hexagons, offsets, errors) for
+    consecutive chunks of chunk_size records: NumPy arrays of positions of valid records, of
+    all their hexagons (a k x 2 array) and of offsets (hexagons of the i-th valid record are
+    hexagons[offsets[i]:offsets[i + 1]]), and the list of invalid records.
+    """
+    import numpy
+    positions, flat, offsets, errors = [], [], [0], []
+    for record in records:
+        if record.error is not None:
+            errors.append(record)
+        else:
+            positions.append(record.position)
+            flat.extend(c for h in record.hexagons for c in h)
+            offsets.append(len(flat) // 2)
+        if len(positions) + len(errors) == chunk_size:
+            yield (numpy.array(positions, dtype=numpy.int64), numpy.array(flat, dtype=numpy.int32).reshape(-1, 2),
+                   numpy.array(offsets, dtype=numpy.int64), errors)
+            positions, flat, offsets, errors = [], [], [0], []
+    if len(positions) + len(errors) > 0:
+        yield (numpy.array(positions, dtype=numpy.int64), numpy.array(flat, dtype=numpy.int32).reshape(-1, 2),
+               numpy.array(offsets, dtype=numpy.int64), errors)
+
+
 if __name__ == '__main__':
     code = '53335111'
     print(bec_to_hex_list(code))
@@ -0,0 +1,179 @@
+import collections
+import csv
+import itertools
+import logging
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+import uuid
+import zipfile
+
+import lib.importer as importer
+
+
+logger = logging.getLogger(__name__)
+
+MAX_JOBS = 100  # Number of most recent jobs kept (older ones are deleted with their files).
+
+
+def _run_chunk(args):
+    function, records = args
+    return list(function(records))
+
+
+class Job(object):
+
+    def __init__(self, job_id, directory, filename, file_format, pictures):
+        """
+        Construct a queued job whose files (the upload, the results and the pictures) live in
+        the directory.
+        """
+        self.id = job_id
+        self.directory = directory
+        self.filename = filename
+        self.file_format = file_format
+        self.pictures = pictures
+        self.status = 'queued'  # Then 'running' and finally 'done' or 'failed'.
+        self.error = None
+        self.total = None  # Known once the whole file is read.
+        self.done = 0
+        self.errors = 0
+        self.created = time.time()
+        self.finished = None
+
+    def input_path(self):
+        return os.path.join(self.directory, 'input')
+
+    def csv_path(self):
+        return os.path.join(self.directory, 'results.csv')
+
+    def zip_path(self):
+        return os.path.join(self.directory, 'results.zip')
+
+    def pictures_path(self):
+        return os.path.join(self.directory, 'pictures')
+
+    def info(self):
+        """
+        Return the JSON-serialisable dictionary describing the state of the job.
+        """
+        return {'id': self.id, 'filename': self.filename, 'format': self.file_format, 'status': self.status,
+                'error': self.error, 'total': self.total, 'done': self.done, 'errors': self.errors,
+                'seconds': (self.finished or time.time()) - self.created}
+
+
+class JobManager(object):
+
+    def __init__(self, directory, function, fields, render=None, processes=None, chunk_size=100):
+        """
+        Construct the manager of background jobs. A job streams the records of an uploaded file
+        (see importer.read_benzenoids) in chunks of chunk_size to function (a generator of result
+        rows, e.g. analyser.batch_analyse) in a pool of worker processes of its own (None
+        means one per CPU) and appends the rows to a CSV file with the given fields as chunks
+        finish. If a job asks for pictures, render (a function of a list of hexagons and the
+        path of the PNG picture to write, e.g. analyser.hex2png) is called in the thread of the
+        job for the first benzenoid with each BEC.
+        """
+        self.directory = directory
+        self.function = function
+        self.fields = fields
+        self.render = render
+        self.processes = processes
+        self.chunk_size = chunk_size
+        self.jobs = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, stream, filename, file_format='bec', pictures=False):
+        """
+        Save the uploaded file (a binary file-like object) and start a job that analyses it in
+        the background. Return the id of the job.
+        """
+        if file_format not in importer.READERS:
+            raise ValueError('unknown format {0!r}'.format(file_format))
+        job_id = uuid.uuid4().hex
+        job = Job(job_id, os.path.join(self.directory, job_id), filename, file_format,
+                  pictures and self.render is not None)
+        os.makedirs(job.directory)
+        with open(job.input_path(), 'wb') as f:
+            shutil.copyfileobj(stream, f)
+        with self.lock:
+            self.jobs[job_id] = job
+            while len(self.jobs) > MAX_JOBS:
+                _, old = self.jobs.popitem(last=False)
+                shutil.rmtree(old.directory, ignore_errors=True)
+        threading.Thread(target=self._run, args=(job,), daemon=True).start()
+        return job_id
+
+    def _draw(self, job, rows, records, drawn):
+        for row, record in zip(rows, records):
+            if row.get('error') is not None or row.get('bec') in drawn:
+                continue
+            drawn.add(row['bec'])
+            try:
+                self.render(record.hexagons, os.path.join(job.pictures_path(), row['bec'] + '.png'))
+            except Exception:
+                logger.exception('picture of %s failed', row['bec'])
+
+    def _run(self, job):
+        try:
+            records = importer.read_benzenoids(job.input_path(), job.file_format)
+            chunks = iter(lambda: list(itertools.islice(records, self.chunk_size)), [])
+            window = 2 * (self.processes or os.cpu_count() or 1)  # Chunks in flight.
+            pending = collections.deque()
+            drawn = set()
+            if job.pictures:
+                os.makedirs(job.pictures_path(), exist_ok=True)
+            job.status = 'running'
+            with multiprocessing.Pool(self.processes) as pool, open(job.csv_path(), 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=self.fields, extrasaction='ignore')
+                writer.writeheader()
+                exhausted = False
+                while True:
+                    while not exhausted and len(pending) < window:
+                        chunk = next(chunks, None)
+                        if chunk is None:
+                            exhausted = True
+                        else:
+                            pending.append((chunk, pool.apply_async(_run_chunk, ((self.function, chunk),))))
+                    if len(pending) == 0:
+                        break
+                    chunk, result = pending.popleft()
+                    rows = result.get()
+                    writer.writerows(rows)
+                    f.flush()
+                    if job.pictures:
+                        self._draw(job, rows, chunk, drawn)
+                    job.errors += sum(1 for row in rows if row.get('error') is not None)
+                    job.done += len(rows)
+            job.total = job.done
+            job.status = 'done'
+        except Exception as error:
+            logger.exception('job %s failed', job.id)
+            job.error = str(error)
+            job.status = 'failed'
+        job.finished = time.time()
+
+    def get(self, job_id):
+        """
+        Return the Job with the given id, or None if there is no such job.
+        """
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def archive(self, job):
+        """
+        Return the path of the ZIP archive of a finished job: the CSV file and the pictures
+        rendered for the job. The archive is made on the first request.
+        """
+        if not os.path.exists(job.zip_path()):
+            partial = job.zip_path() + '.part'
+            with zipfile.ZipFile(partial, 'w', zipfile.ZIP_DEFLATED) as z:
+                z.write(job.csv_path(), 'results.csv')
+                if os.path.isdir(job.pictures_path()):
+                    for name in sorted(os.listdir(job.pictures_path())):
+                        z.write(os.path.join(job.pictures_path(), name), os.path.join('pictures', name),
+                                compress_type=zipfile.ZIP_STORED)
+            os.replace(partial, job.zip_path())
+        return job.zip_path()
@@ -0,0 +1,274 @@
+import collections
+
+
+# Offsets of the six hexagons adjacent to a hexagon (xi, eta). The hexagon at position nu
+# shares the edge nu (0 <= nu <= 5) with the given hexagon.
+FACE_NEIGHBOURS = [(-1, 1), (0, 1), (1, 0), (1, -1), (0, -1), (-1, 0)]
+
+
+def face_neighbours(h):
+    """
+    Return the list of labels of the six hexagons adjacent to the hexagon h.
+    """
+    xi, eta = h
+    return [(xi + d_xi, eta + d_eta) for d_xi, d_eta in FACE_NEIGHBOURS]
+
+
+def hexagon_list(benzenoid):
+    """
+    Return the list of hexagons of a Benzenoid object or of a list of hexagons.
+    """
+    if hasattr(benzenoid, 'face_coordinates'):
+        return list(benzenoid.face_coordinates())
+    return [tuple(h) for h in benzenoid]
+
+
+def hex_distance(h1, h2):
+    """
+    Return the number of steps needed to get from one hexagon to another.
+    """
+    d_xi, d_eta = h1[0] - h2[0], h1[1] - h2[1]
+    return (abs(d_xi) + abs(d_eta) + abs(d_xi + d_eta)) // 2
+
+
+def hole_cells(faces):
+    """
+    Return the list of holes of the benzenoid given by the set of its hexagons. Each hole is
+    represented as the sorted list of (empty) hexagons inside it.
+
+    Note: The flood fill only visits empty cells that lie between the left-most and the
+    right-most hexagon of their row; every other cell is outside.
+    """
+    rows = dict()
+    for xi, eta in faces:
+        lo, hi = rows.get(eta, (xi, xi))
+        rows[eta] = (min(lo, xi), max(hi, xi))
+    candidates = {(xi, eta) for eta, (lo, hi) in rows.items() for xi in range(lo + 1, hi)
+                  if (xi, eta) not in faces}
+
+    # Remove the empty cells connected to the outside.
+    queue = collections.deque(c for c in candidates
+                              if any(w not in faces and w not in candidates for w in face_neighbours(c)))
+    outside = set(queue)
+    while len(queue) > 0:
+        for w in face_neighbours(queue.popleft()):
+            if w in candidates and w not in outside:
+                outside.add(w)
+                queue.append(w)
+    candidates -= outside
+
+    # Split the remaining cells into connected components.
+    holes = []
+    while len(candidates) > 0:
+        start = min(candidates)
+        candidates.discard(start)
+        component = [start]
+        queue = collections.deque(component)
+        while len(queue) > 0:
+            for w in face_neighbours(queue.popleft()):
+                if w in candidates:
+                    candidates.discard(w)
+                    component.append(w)
+                    queue.append(w)
+        holes.append(sorted(component))
+    return sorted(holes)
+
+
+def is_connected(faces):
+    """
+    Return True if the set of hexagons is non-empty and connected.
+    """
+    if len(faces) == 0:
+        return False
+    start = next(iter(faces))
+    seen = {start}
+    queue = collections.deque([start])
+    while len(queue) > 0:
+        for f in face_neighbours(queue.popleft()):
+            if f in faces and f not in seen:
+                seen.add(f)
+                queue.append(f)
+    return len(seen) == len(faces)
+
+
+def bottom_left_hexagon(faces):
+    """
+    Return the bottom-most left-most hexagon of a non-empty set of hexagons.
+    """
+    if len(faces) == 0:
+        raise ValueError('the benzenoid is empty')
+    return min(faces, key=lambda h: (h[1], h[0]))
+
+
+def perimeter_degrees(faces):
+    """
+    Return the string of degrees of vertices on the perimeter of the (connected) benzenoid
+    given by the set of its hexagons, in cyclic order.
+
+    Note: The walk starts at the edge 4 of the bottom-left hexagon (its lower neighbour is
+    empty) and goes around the outside using only membership tests. From the edge e of the
+    hexagon f it goes through the vertex shared by the edges e and e + 1 of f: if the hexagon
+    g across the edge e + 1 is missing, the vertex has degree 2 and the walk continues with
+    the edge e + 1 of f; otherwise the vertex has degree 3 and the walk continues with the
+    edge e - 1 of g (which borders the same empty cell). Each edge of the perimeter is
+    visited once.
+    """
+    start = (bottom_left_hexagon(faces), 4)
+    f, e = start
+    ret = []
+    while True:
+        d_xi, d_eta = FACE_NEIGHBOURS[(e + 1) % 6]
+        g = (f[0] + d_xi, f[1] + d_eta)
+        if g in faces:
+            ret.append('3')
+            f, e = g, (e + 5) % 6
+        else:
+            ret.append('2')
+            e = (e + 1) % 6
+        if (f, e) == start:
+            return ''.join(ret)
+
+
+def boundary_edges_code(faces):
+    """
+    Return the (canonical) boundary-edges code of the (connected) benzenoid given by the set
+    of its hexagons, in time linear in the length of its perimeter (see perimeter_degrees and
+    canonical_bec).
+    """
+    return bec_from_degrees(perimeter_degrees(faces))
+
+
+def bec_from_degrees(vert_degrees):
+    """
+    Return the (canonical) boundary-edges code of a boundary cycle, given the string of degrees
+    of its vertices in cyclic order.
+    """
+    if '3' not in vert_degrees:
+        return '6'  # This must be benzene.
+    pos = vert_degrees.index('3')
+    code = ''.join(str(len(seg) + 1) for seg in (vert_degrees[pos+1:] + vert_degrees[:pos]).split('3'))
+    return canonical_bec(code)
+
+
+def largest_rotation(code):
+    """
+    Return the lexicographically largest rotation of a string.
+
+    Note: Booth's algorithm (with the order reversed) takes linear time.
+    """
+    doubled = code + code
+    failure = [-1] * len(doubled)
+    k = 0  # Start of the best rotation found so far.
+    for j in range(1, len(doubled)):
+        c = doubled[j]
+        i = failure[j - k - 1]
+        while i != -1 and c != doubled[k + i + 1]:
+            if c > doubled[k + i + 1]:
+                k = j - i - 1
+            i = failure[i]
+        if c != doubled[k + i + 1]:  # Here i == -1.
+            if c > doubled[k]:
+                k = j
+            failure[j - k] = -1
+        else:
+            failure[j - k] = i + 1
+    return doubled[k:k + len(code)]
+
+
+def canonical_bec(code):
+    """
+    Return the canonical form of a boundary-edges code, i.e. the lexicographically largest
+    string among its rotations and the rotations of its reverse.
+    """
+    return max(largest_rotation(code), largest_rotation(code[::-1]))
+
+
+def convex_deficit(code):
+    """
+    Return the convex deficit of a benzenoid given by its boundary-edges code: the least k >= 0
+    such that every k + 1 cyclically consecutive entries of the code sum to at least 2(k + 1),
+    or -1 if there is no such k.
+    """
+    n = len(code)
+    prefix = [0]
+    for c in code + code:
+        prefix.append(prefix[-1] + int(c))
+    for k in range(1, n):
+        if all(prefix[m + k] - prefix[m] >= 2 * k for m in range(n)):
+            return k - 1
+    return -1
+
+
+# Canonical labels (relative to the hexagon) of the six vertices and the six edges of a hexagon
+# (see Vertex.canonical_label and Edge.canonical_label in lib.benzenoids).
+FACE_VERTICES = [(0, 0, 0), (0, 0, 1), (1, -1, 0), (0, -1, 1), (0, -1, 0), (-1, 0, 1)]
+FACE_EDGES = [(0, 0, 0), (0, 0, 1), (0, 0, 2), (1, -1, 0), (0, -1, 1), (-1, 0, 2)]
+
+
+def endpoint_indices(vertices, edges):
+    """
+    Return the pair of NumPy arrays of indices (positions in the sorted k x 3 array of vertex
+    labels) of both endpoints of the edges given by the array of canonical edge labels.
+
+    Note: Labels are packed into integer keys whose order agrees with the order of labels, so
+    the lookup is a single searchsorted call.
+    """
+    import numpy
+    xi_min, eta_min = vertices[:, 0].min(initial=0) - 1, vertices[:, 1].min(initial=0) - 1
+    width = vertices[:, 1].max(initial=0) - eta_min + 2
+
+    def key(xi, eta, nu):
+        return ((xi - xi_min) * width + (eta - eta_min)) * 2 + nu
+
+    xi, eta, nu = edges.T
+    # Endpoints of edges (see Edge.endpoint_labels) for nu = 0, 1, 2.
+    u = numpy.choose(nu, [key(xi - 1, eta, 1), key(xi, eta, 0), key(xi, eta, 1)])
+    v = numpy.choose(nu, [key(xi, eta, 0), key(xi, eta, 1), key(xi + 1, eta - 1, 0)])
+    vertex_keys = key(*vertices.T)
+    return numpy.searchsorted(vertex_keys, u), numpy.searchsorted(vertex_keys, v)
+
+
+def csr_from_edges(n, u, v):
+    """
+    Return the CSR adjacency matrix (indptr, indices) of the graph on n vertices with edges u[i]v[i].
+    """
+    import numpy
+    rows = numpy.concatenate([u, v])
+    cols = numpy.concatenate([v, u])
+    order = numpy.lexsort((cols, rows))
+    indptr = numpy.zeros(n + 1, dtype=numpy.int64)
+    numpy.cumsum(numpy.bincount(rows, minlength=n), out=indptr[1:])
+    return indptr, cols[order]
+
+
+def graph_arrays(hexagons):
+    """
+    Return the triple (vertices, edges, endpoints) of NumPy arrays describing the graph of the
+    benzenoid given by the list of its hexagons: the sorted n x 3 array of vertex labels, the
+    sorted m x 3 array of edge labels and the m x 2 array of indices of endpoints of edges.
+    """
+    import numpy
+    faces = numpy.array(list(hexagons), dtype=numpy.int64).reshape(-1, 1, 2)
+    offsets = numpy.array(FACE_VERTICES, dtype=numpy.int64)
+    vertices = numpy.concatenate([faces + offsets[:, :2], numpy.broadcast_to(offsets[:, 2:], (len(faces), 6, 1))],
+                                 axis=2).reshape(-1, 3)
+    offsets = numpy.array(FACE_EDGES, dtype=numpy.int64)
+    edges = numpy.concatenate([faces + offsets[:, :2], numpy.broadcast_to(offsets[:, 2:], (len(faces), 6, 1))],
+                              axis=2).reshape(-1, 3)
+    vertices = numpy.unique(vertices, axis=0)
+    edges = numpy.unique(edges, axis=0)
+    u, v = endpoint_indices(vertices, edges)
+    return vertices, edges, numpy.stack([u, v], axis=1)
+
+
+def vertex_coordinates(vertices, edge_length=1.4):
+    """
+    Return the n x 2 NumPy array of cartesian coordinates of vertices given by the array of
+    their canonical labels (see Vertex.get_coordinates).
+    """
+    import numpy
+    xi, eta, nu = vertices.T
+    altitude = 3**0.5 * edge_length / 2
+    x = eta * altitude + 2 * xi * altitude + nu * altitude
+    y = 3 / 2 * eta * edge_length + numpy.where(nu == 0, edge_length, edge_length / 2)
+    return numpy.stack([x, y], axis=1)
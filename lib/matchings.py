@@ -0,0 +1,288 @@
+# NumPy is imported inside the functions (see lib.benzenoids).
+
+
+def _incidence(n, endpoints):
+    """
+    Return the list of lists of pairs (neighbour, edge id) for the vertices 0 ... n-1 of the
+    graph given by the m x 2 array of endpoints of edges.
+    """
+    ret = [[] for _ in range(n)]
+    for e, (u, v) in enumerate(endpoints.tolist()):
+        ret[u].append((v, e))
+        ret[v].append((u, e))
+    return ret
+
+
+def perfect_matchings(n, endpoints):
+    """
+    Make a generator object that will yield every perfect matching of the graph on n vertices
+    given by the m x 2 array of endpoints of edges, as a bitset (int) with bit e set if the
+    e-th edge belongs to the matching.
+
+    Note: The lowest unmatched vertex is matched in every possible way (so the graph is swept
+    in the order of vertex indices) and forced moves are propagated after each choice: a
+    vertex with one unmatched neighbour is matched at once, a vertex with none cuts the branch.
+    The search is iterative and keeps O(n) state.
+    """
+    if n % 2 == 1:
+        return
+    incident = _incidence(n, endpoints)
+    matched = [-1] * n  # Edge id covering the vertex, or -1.
+    avail = [len(pairs) for pairs in incident]  # Number of unmatched neighbours.
+    trail = []  # Matched pairs in the order of matching.
+
+    def match(u, w, e, queue):
+        matched[u] = matched[w] = e
+        trail.append((u, w))
+        for x in (u, w):
+            for y, _ in incident[x]:
+                if matched[y] < 0:
+                    avail[y] -= 1
+                    if avail[y] <= 1:
+                        queue.append(y)
+
+    def undo(mark):
+        while len(trail) > mark:
+            u, w = trail.pop()
+            matched[u] = matched[w] = -1
+            for x in (u, w):
+                for y, _ in incident[x]:
+                    if matched[y] < 0 and y != u and y != w:
+                        avail[y] += 1
+
+    def propagate(queue):
+        while len(queue) > 0:
+            y = queue.pop()
+            if matched[y] >= 0:
+                continue
+            if avail[y] == 0:
+                return False
+            if avail[y] == 1:
+                z, e = next((z, e) for z, e in incident[y] if matched[z] < 0)
+                match(y, z, e, queue)
+        return True
+
+    def next_unmatched(v):
+        while v < n and matched[v] >= 0:
+            v += 1
+        return v
+
+    if not propagate([v for v in range(n) if avail[v] <= 1]):
+        return
+    v = next_unmatched(0)
+    if v == n:
+        yield sum(1 << matched[u] for u, _ in trail)
+        return
+    stack = [[v, [(w, e) for w, e in incident[v] if matched[w] < 0], 0, len(trail)]]
+    while len(stack) > 0:
+        frame = stack[-1]
+        v, candidates, pos, mark = frame
+        undo(mark)
+        if pos == len(candidates):
+            stack.pop()
+            continue
+        frame[2] += 1
+        w, e = candidates[pos]
+        queue = []
+        match(v, w, e, queue)
+        if not propagate(queue):
+            continue
+        u = next_unmatched(v + 1)
+        if u == n:
+            yield sum(1 << matched[x] for x, _ in trail)
+        else:
+            stack.append([u, [(w, e) for w, e in incident[u] if matched[w] < 0], 0, len(trail)])
+
+
+def sample_perfect_matchings(vertices, endpoints, k, seed=None):
+    """
+    Return the list of k perfect matchings (bitsets over edge ids, see perfect_matchings) drawn
+    uniformly at random from all perfect matchings of the benzenoid graph given by the sorted
+    n x 3 array of vertex labels and the m x 2 array of endpoints of edges.
+
+    Note: The benzenoid must have no holes: then the number of perfect matchings of any of its
+    subgraphs obtained by deleting matched pairs is |det B| of the biadjacency matrix B (the
+    graph is bipartite by the third coordinate of vertex labels), so the probability that a
+    black vertex b is matched to w is |inv(B)[w, b]|. Vertices are matched one by one and
+    inv(B) is updated by a rank-one downdate after every step, which costs O(n^2).
+    """
+    import numpy
+    rng = numpy.random.default_rng(seed)
+    black = numpy.nonzero(vertices[:, 2] == 0)[0]
+    white = numpy.nonzero(vertices[:, 2] == 1)[0]
+    if len(black) != len(white):
+        raise ValueError('the benzenoid has no Kekulé structures')
+    row = numpy.full(len(vertices), -1)
+    row[black] = numpy.arange(len(black))
+    row[white] = numpy.arange(len(white))
+    u, v = endpoints.T
+    u, v = numpy.where(vertices[u, 2] == 0, u, v), numpy.where(vertices[u, 2] == 0, v, u)
+    biadjacency = numpy.zeros((len(black), len(white)))
+    biadjacency[row[u], row[v]] = 1
+    edge_id = -numpy.ones((len(black), len(white)), dtype=numpy.int64)
+    edge_id[row[u], row[v]] = numpy.arange(len(endpoints))
+    if len(black) == 0:
+        return [0] * k
+    if numpy.linalg.slogdet(biadjacency)[0] == 0:
+        raise ValueError('the benzenoid has no Kekulé structures')
+    inverse = numpy.linalg.inv(biadjacency)  # inverse[w, b]
+    ret = []
+    for _ in range(k):
+        m = inverse.copy()
+        bits = 0
+        for b in range(len(black)):
+            ws = numpy.nonzero(biadjacency[b])[0]
+            p = numpy.abs(m[ws, b])
+            w = ws[rng.choice(len(ws), p=p / p.sum())]
+            bits |= 1 << int(edge_id[b, w])
+            # Delete the row b and the column w of B, i.e. the row w and the column b of inv(B).
+            m -= numpy.outer(m[:, b], m[w, :]) / m[w, b]
+        ret.append(bits)
+    return ret
+
+
+def bitset_edges(bits):
+    """
+    Return the sorted list of edge ids in the bitset.
+    """
+    ret = []
+    while bits:
+        low = bits & -bits
+        ret.append(low.bit_length() - 1)
+        bits ^= low
+    return ret
+
+
+def _sweep_order(vertices, endpoints):
+    """
+    Return the order (a NumPy array of vertex indices) in which matching_numbers sweeps the
+    graph: by rows perpendicular to one of the three lattice directions, whichever keeps the
+    frontier (processed vertices with unprocessed neighbours) smallest.
+    """
+    import numpy
+    import lib.lattice as lattice
+    xy = lattice.vertex_coordinates(vertices)
+    n = len(vertices)
+    best, best_width = None, None
+    for angle in (90, 30, 150):
+        t = numpy.radians(angle)
+        order = numpy.lexsort((xy[:, 0], numpy.round(xy @ [numpy.cos(t), numpy.sin(t)], 6)))
+        pos = numpy.empty(n, dtype=numpy.int64)
+        pos[order] = numpy.arange(n)
+        last = pos.copy()
+        u, v = endpoints.T
+        numpy.maximum.at(last, u, pos[v])
+        numpy.maximum.at(last, v, pos[u])
+        # The vertex at position p stays in the frontier while processing positions p ... last - 1.
+        width = numpy.cumsum(numpy.bincount(pos, minlength=n + 1) - numpy.bincount(last, minlength=n + 1)).max(initial=0)
+        if best is None or width < best_width:
+            best, best_width = order, width
+    return best
+
+
+def _sweep_plan(vertices, endpoints):
+    """
+    Return the tuple (order, pos, incident, leaving) for a frontier dynamic programme: the
+    list of vertices in the sweep order, the position of each vertex in it, the incidence lists
+    (see _incidence) and, for every position, the list of vertices that leave the frontier
+    after the vertex at that position is processed.
+    """
+    n = len(vertices)
+    order = _sweep_order(vertices, endpoints).tolist()
+    pos = [0] * n
+    for i, v in enumerate(order):
+        pos[v] = i
+    incident = _incidence(n, endpoints)
+    last = [max([pos[v]] + [pos[w] for w, _ in incident[v]]) for v in range(n)]
+    leaving = [[] for _ in range(n)]
+    for v in range(n):
+        leaving[last[v]].append(v)
+    return order, pos, incident, leaving
+
+
+def matching_numbers(vertices, endpoints):
+    """
+    Return the list [m_0, m_1, ..., m_(n//2)] of exact numbers of matchings with k edges of
+    the benzenoid graph given by the sorted n x 3 array of vertex labels and the m x 2 array
+    of endpoints of edges.
+
+    Note: Vertices are processed row by row (see _sweep_order) by a transfer-matrix (frontier)
+    dynamic programme. A state is the set of matched vertices in the frontier and its value is
+    the list of numbers of partial matchings by size; a vertex leaves the frontier once all
+    its edges are processed. The number of states is at most 2^w for the frontier width w
+    (about twice the number of hexagons in a row), so the method suits long rather than wide
+    benzenoids.
+    """
+    n = len(vertices)
+    order, pos, incident, leaving = _sweep_plan(vertices, endpoints)
+    states = {0: [1]}
+    bit = dict()  # Vertex in the frontier -> its bit in states.
+    free = []
+    for i, v in enumerate(order):
+        bit[v] = free.pop() if len(free) > 0 else len(bit)
+        b_v = 1 << bit[v]
+        for w, _ in incident[v]:
+            if pos[w] > i:
+                continue
+            b_w = 1 << bit[w]
+            new = dict(states)
+            for state, counts in states.items():
+                if state & (b_v | b_w) == 0:
+                    key = state | b_v | b_w
+                    target = new.get(key)
+                    shifted = [0] + counts
+                    if target is None:
+                        new[key] = shifted
+                    else:
+                        new[key] = [a + b for a, b in zip(target + [0] * (len(shifted) - len(target)),
+                                                          shifted + [0] * (len(target) - len(shifted)))]
+            states = new
+        for u in leaving[i]:
+            mask = ~(1 << bit[u])
+            merged = dict()
+            for state, counts in states.items():
+                key = state & mask
+                target = merged.get(key)
+                if target is None:
+                    merged[key] = counts
+                else:
+                    if len(target) < len(counts):
+                        target, counts = counts, target
+                    merged[key] = [a + b for a, b in zip(target, counts + [0] * (len(target) - len(counts)))]
+            states = merged
+            free.append(bit.pop(u))
+    ret = states.get(0, [1]) if n > 0 else [1]
+    return ret + [0] * (n // 2 + 1 - len(ret))
+
+
+def count_perfect_matchings(vertices, endpoints):
+    """
+    Return the exact number of perfect matchings of the graph given as in matching_numbers.
+
+    Note: The same sweep as in matching_numbers, but a vertex must be matched when it leaves
+    the frontier, so the value of a state is a single integer.
+    """
+    n = len(vertices)
+    if n % 2 == 1:
+        return 0
+    order, pos, incident, leaving = _sweep_plan(vertices, endpoints)
+    states = {0: 1}
+    bit = dict()
+    free = []
+    for i, v in enumerate(order):
+        bit[v] = free.pop() if len(free) > 0 else len(bit)
+        b_v = 1 << bit[v]
+        for w, _ in incident[v]:
+            if pos[w] > i:
+                continue
+            both = b_v | (1 << bit[w])
+            new = dict(states)
+            for state, count in states.items():
+                if state & both == 0:
+                    new[state | both] = new.get(state | both, 0) + count
+            states = new
+        for u in leaving[i]:
+            b_u = 1 << bit[u]
+            states = {state ^ b_u: count for state, count in states.items() if state & b_u}
+            free.append(bit.pop(u))
+    return states.get(0, 0)
@@ -0,0 +1,139 @@
+import collections
+import contextlib
+import json
+import logging
+import math
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.95, 0.99)
+RESERVOIR_SIZE = 1024  # Number of most recent samples used for quantile estimates.
+
+
+class Histogram(object):
+
+    def __init__(self, size=RESERVOIR_SIZE):
+        """
+        Construct an empty histogram that keeps the most recent samples.
+        """
+        self.count = 0
+        self.total = 0.0
+        self.samples = collections.deque(maxlen=size)
+
+    def observe(self, value):
+        """
+        Record a new sample.
+        """
+        self.count += 1
+        self.total += value
+        self.samples.append(value)
+
+    def quantile(self, q):
+        """
+        Return the q-quantile (0 <= q <= 1) of the recent samples (nearest-rank method).
+        """
+        if len(self.samples) == 0:
+            return float('nan')
+        ordered = sorted(self.samples)
+        k = max(0, min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1))
+        return ordered[k]
+
+
+# Histograms are kept per (metric name, label value) pair.
+_lock = threading.Lock()
+_histograms = collections.OrderedDict()
+_local = threading.local()
+
+_help = {
+    'mob_stage_seconds': 'Time spent in each stage of the analyser pipeline.',
+    'mob_request_seconds': 'Total time spent serving a request.',
+}
+_label = {
+    'mob_stage_seconds': 'stage',
+    'mob_request_seconds': 'endpoint',
+}
+
+
+def observe(metric, label, value):
+    """
+    Add a sample (in seconds) to the histogram of the given metric and label.
+    """
+    with _lock:
+        key = (metric, label)
+        if key not in _histograms:
+            _histograms[key] = Histogram()
+        _histograms[key].observe(value)
+
+
+@contextlib.contextmanager
+def stage(name):
+    """
+    Time the enclosed block as one stage of the pipeline.
+
+    The elapsed time is added to the global histograms and, if a request is being
+    tracked in the current thread, to its per-stage breakdown.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe('mob_stage_seconds', name, elapsed)
+        breakdown = getattr(_local, 'breakdown', None)
+        if breakdown is not None:
+            breakdown[name] = breakdown.get(name, 0.0) + elapsed
+
+
+def begin_request():
+    """
+    Start tracking the stages of a request served by the current thread.
+    """
+    _local.breakdown = collections.OrderedDict()
+    _local.start = time.perf_counter()
+
+
+def end_request(endpoint):
+    """
+    Finish tracking the current request, record its total time and emit one
+    structured (JSON) log line with the stage breakdown.
+    """
+    breakdown = getattr(_local, 'breakdown', None)
+    if breakdown is None:
+        return None
+    total = time.perf_counter() - _local.start
+    _local.breakdown = None
+    observe('mob_request_seconds', endpoint, total)
+    record = {
+        'endpoint': endpoint,
+        'total': round(total, 6),
+        'stages': {name: round(t, 6) for name, t in breakdown.items()},
+    }
+    logger.info(json.dumps(record))
+    return record
+
+
+def prometheus_text():
+    """
+    Return all histograms in the Prometheus text exposition format (as summaries).
+    """
+    with _lock:
+        snapshot = [(metric, label, hist.count, hist.total,
+                     [(q, hist.quantile(q)) for q in QUANTILES])
+                    for (metric, label), hist in _histograms.items()]
+    lines = []
+    for metric in _help:
+        rows = [row for row in snapshot if row[0] == metric]
+        if len(rows) == 0:
+            continue
+        lines.append('# HELP {0} {1}'.format(metric, _help[metric]))
+        lines.append('# TYPE {0} summary'.format(metric))
+        for _, label, count, total, quantiles in rows:
+            selector = '{0}="{1}"'.format(_label[metric], label)
+            for q, value in quantiles:
+                lines.append('{0}{{{1},quantile="{2}"}} {3:.9f}'.format(metric, selector, q, value))
+            lines.append('{0}_sum{{{1}}} {2:.9f}'.format(metric, selector, total))
+            lines.append('{0}_count{{{1}}} {2}'.format(metric, selector, count))
+    return '\n'.join(lines) + '\n'
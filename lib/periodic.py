@@ -0,0 +1,344 @@
+import fractions
+import math
+
+import lib.benzenoids as bz
+import lib.lattice as lattice
+
+# NumPy is imported inside the functions (see lib.benzenoids).
+
+
+def berlekamp_massey(terms):
+    """
+    Return the list [c_1, ..., c_L] of coefficients of the shortest linear recurrence
+    a_i = c_1 a_(i-1) + ... + c_L a_(i-L) satisfied by the sequence of terms (computed exactly
+    over the rationals; the coefficients are returned as integers when they are integral).
+    """
+    terms = [fractions.Fraction(t) for t in terms]
+    current, previous = [], []  # Coefficients of the current and the last replaced recurrence.
+    shift, last_discrepancy = -1, fractions.Fraction(1)
+    for i, t in enumerate(terms):
+        discrepancy = t - sum(c * terms[i - 1 - j] for j, c in enumerate(current))
+        if discrepancy == 0:
+            continue
+        factor = discrepancy / last_discrepancy
+        candidate = [0] * (i - shift - 1) + [factor] + [-factor * c for c in previous]
+        candidate += [0] * (len(current) - len(candidate))
+        candidate = [a + b for a, b in zip(candidate, current + [0] * (len(candidate) - len(current)))]
+        if i - shift + len(previous) > len(current):
+            previous, shift, last_discrepancy = current, i, discrepancy
+        current = candidate
+    return [int(c) if c.denominator == 1 else c for c in current]
+
+
+def _matrix_product(a, b):
+    return [[sum(x * y for x, y in zip(row, col)) for col in zip(*b)] for row in a]
+
+
+def _matrix_power(a, k):
+    ret = [[int(i == j) for j in range(len(a))] for i in range(len(a))]
+    while k > 0:
+        if k & 1:
+            ret = _matrix_product(ret, a)
+        a = _matrix_product(a, a)
+        k >>= 1
+    return ret
+
+
+def linear_recurrence_term(initial, coefficients, k):
+    """
+    Return the k-th term (k >= 0) of the sequence that starts with the given initial terms
+    and then follows the linear recurrence with the given coefficients (see berlekamp_massey),
+    using fast exponentiation of the companion (transfer) matrix.
+    """
+    size = len(coefficients)
+    if k < len(initial):
+        return initial[k]
+    if size == 0:
+        return 0
+    companion = [list(coefficients)] + [[int(j == i) for j in range(size)] for i in range(size - 1)]
+    power = _matrix_power(companion, k - len(initial) + 1)
+    state = [initial[len(initial) - 1 - j] for j in range(size)]  # Newest term first.
+    ret = sum(x * y for x, y in zip(power[0], state))
+    return int(ret) if fractions.Fraction(ret).denominator == 1 else ret
+
+
+def _cover_counts(edges, required, optional):
+    """
+    Return the dictionary that maps a bit mask over the list optional (of vertex labels) to the
+    number of matchings in the list of edges (canonical labels) that cover every vertex in the
+    set required and exactly the optional vertices in the mask.
+
+    Note: Edges are added one by one; a required vertex is dropped from the state (and must be
+    covered) after its last edge, so the state stays small.
+    """
+    bit = {v: 1 << i for i, v in enumerate(optional)}
+    for v in sorted(required):
+        bit[v] = 1 << len(bit)
+    last = dict()
+    ends = [bz.Edge.endpoint_labels(e) for e in edges]
+    for i, (a, b) in enumerate(ends):
+        last[a] = last[b] = i
+    if any(v not in last for v in required):
+        return dict()
+    leaving = [[] for _ in ends]
+    for v in required:
+        leaving[last[v]].append(bit[v])
+    states = {0: 1}
+    for i, (a, b) in enumerate(ends):
+        both = bit[a] | bit[b]
+        new = dict(states)
+        for state, count in states.items():
+            if state & both == 0:
+                new[state | both] = new.get(state | both, 0) + count
+        states = new
+        for b_v in leaving[i]:
+            states = {state ^ b_v: count for state, count in states.items() if state & b_v}
+    return states
+
+
+class _Copies(object):
+
+    def __init__(self, cell, translation, repeats):
+        """
+        Construct the (virtual) set of hexagons of repeats translated copies of the cell; it
+        supports membership tests and iteration without storing the hexagons.
+        """
+        self.cell = cell
+        self.translation = translation
+        self.repeats = repeats
+
+    def __contains__(self, h):
+        a, b = self.translation
+        for xi, eta in self.cell:
+            d_xi, d_eta = h[0] - xi, h[1] - eta
+            r = d_xi // a if a != 0 else d_eta // b
+            if (r * a, r * b) == (d_xi, d_eta) and 0 <= r < self.repeats:
+                return True
+        return False
+
+    def __iter__(self):
+        a, b = self.translation
+        return ((xi + r * a, eta + r * b) for r in range(self.repeats) for xi, eta in self.cell)
+
+    def __len__(self):
+        return len(self.cell) * self.repeats
+
+
+class PeriodicBenzenoid(object):
+
+    def __init__(self, unit_cell, translation, repeats):
+        """
+        Construct the benzenoid formed by repeats copies of the unit cell (a list of hexagons),
+        the r-th copy translated by r times the translation (a vector of the lattice). Copies
+        may only touch consecutive copies, e.g. the linear acene with k hexagons is
+        PeriodicBenzenoid([(0, 0)], (1, 0), k) and the zigzag strip (parallelogram) of width
+        b is PeriodicBenzenoid([(0, j) for j in range(b)], (1, 0), k).
+        """
+        self.cell = sorted(set(tuple(h) for h in unit_cell))
+        self.translation = tuple(translation)
+        self.repeats = repeats
+        if repeats < 1:
+            raise ValueError('the number of repeats must be positive')
+        if len(self.cell) == 0 or not lattice.is_connected(set(self.cell)):
+            raise ValueError('the unit cell must be a connected benzenoid')
+        if self.translation == (0, 0):
+            raise ValueError('the translation must not be zero')
+        two = set(self.hexagon_list(2))
+        if len(two) != 2 * len(self.cell) or not lattice.is_connected(two):
+            raise ValueError('consecutive copies of the unit cell must be disjoint and adjacent')
+        diameter = max(lattice.hex_distance(x, y) for x in self.cell for y in self.cell)
+        r = 2
+        while lattice.hex_distance(self._shift(self.cell[0], r), self.cell[0]) <= diameter + 1:
+            far = {self._shift(h, r) for h in self.cell}
+            if any(f in far for x in self.cell for f in [x] + lattice.face_neighbours(x)):
+                raise ValueError('copies of the unit cell may only touch consecutive copies')
+            r += 1
+        # Vertices and edges of the cell that do not belong to the previous copy; every vertex
+        # and edge of the benzenoid is a translate of exactly one of them.
+        vertices, edges = self._labels(self.cell)
+        previous = [self._shift(h, -1) for h in self.cell]
+        prev_vertices, prev_edges = self._labels(previous)
+        self.cell_vertices = sorted(vertices - prev_vertices)
+        self.cell_edges = sorted(edges - prev_edges)
+        self.first_vertices = len(vertices)
+        self.first_edges = len(edges)
+
+    def _shift(self, label, r):
+        """
+        Return the label of a hexagon, a vertex or an edge translated by r times the translation.
+        """
+        return (label[0] + r * self.translation[0], label[1] + r * self.translation[1]) + tuple(label[2:])
+
+    @staticmethod
+    def _labels(hexagons):
+        vertices = {(xi + a, eta + b, nu) for xi, eta in hexagons for a, b, nu in lattice.FACE_VERTICES}
+        edges = {(xi + a, eta + b, nu) for xi, eta in hexagons for a, b, nu in lattice.FACE_EDGES}
+        return vertices, edges
+
+    def hexagon_list(self, repeats=None):
+        """
+        Return the list of hexagons (of the given number of copies, by default of all of them).
+        """
+        repeats = self.repeats if repeats is None else repeats
+        return [self._shift(h, r) for r in range(repeats) for h in self.cell]
+
+    def benzenoid(self, repeats=None):
+        """
+        Return the Benzenoid object (of the given number of copies, by default of all of them).
+        """
+        return bz.Benzenoid(self.hexagon_list(repeats))
+
+    def get_h(self):
+        """
+        Return the number of hexagons.
+        """
+        return self.repeats * len(self.cell)
+
+    def get_n(self):
+        """
+        Return the number of vertices (the first copy adds all its vertices, every further copy
+        the vertices not shared with the previous one).
+        """
+        return self.first_vertices + (self.repeats - 1) * len(self.cell_vertices)
+
+    def get_m(self):
+        """
+        Return the number of edges (see get_n).
+        """
+        return self.first_edges + (self.repeats - 1) * len(self.cell_edges)
+
+    def boundary_edges_code(self):
+        """
+        Return the (canonical) boundary-edges code.
+
+        Note: The perimeter is traced on the virtual set of hexagons (see _Copies), so the time
+        is linear in the perimeter (for a fixed unit cell) and no hexagons are stored.
+        """
+        return lattice.boundary_edges_code(_Copies(self.cell, self.translation, self.repeats))
+
+    def convex_deficit(self):
+        """
+        Return the convex deficit (see lattice.convex_deficit).
+        """
+        return lattice.convex_deficit(self.boundary_edges_code())
+
+    def transfer_matrix(self):
+        """
+        Return the triple (u, M, full) describing the numbers of Kekulé structures: states are
+        bit masks over the sorted list of vertices shared by the first two copies (bit i set if
+        the i-th shared vertex is already matched), u maps a state to the number of matchings
+        of the first copy that cover all its other vertices, M (a dictionary of dictionaries)
+        maps a pair of states of consecutive interfaces to the number of ways of matching the
+        vertices added by a copy, and full is the state with all bits set. Then K(r) is the
+        full entry of u M^(r-1).
+        """
+        vertices, edges = self._labels(self.cell)
+        next_vertices, _ = self._labels([self._shift(h, 1) for h in self.cell])
+        shared = sorted(vertices & next_vertices)
+        k = len(shared)
+        full = (1 << k) - 1
+        u = _cover_counts(sorted(edges), vertices - set(shared), shared)
+        added = {self._shift(v, 1) for v in self.cell_vertices}
+        interface = [self._shift(v, 1) for v in shared]
+        counts = _cover_counts(sorted(self._shift(e, 1) for e in self.cell_edges), added - set(interface),
+                               shared + interface)
+        matrix = dict()
+        for mask, count in counts.items():
+            before, after = mask & full, mask >> k
+            row = matrix.setdefault(full ^ before, dict())
+            row[after] = row.get(after, 0) + count
+        return u, matrix, full
+
+    def kekule_recurrence(self):
+        """
+        Return the pair (initial terms, coefficients) of the linear recurrence (see
+        berlekamp_massey) satisfied by the numbers of Kekulé structures K(1), K(2), ...
+
+        Note: K(r) is the full entry of u M^(r-1) (see transfer_matrix), so the sequence lies in
+        the span of the d states reachable from u and satisfies a recurrence of order at most
+        d. The first 2d terms, computed exactly by iterating the transfer matrix, therefore
+        determine the minimal recurrence.
+        """
+        u, matrix, full = self.transfer_matrix()
+        reachable = set(u)
+        stack = list(u)
+        while len(stack) > 0:
+            for t in matrix.get(stack.pop(), ()):
+                if t not in reachable:
+                    reachable.add(t)
+                    stack.append(t)
+        terms = []
+        vector = u
+        for _ in range(2 * len(reachable)):
+            terms.append(vector.get(full, 0))
+            new = dict()
+            for s, count in vector.items():
+                for t, ways in matrix.get(s, dict()).items():
+                    new[t] = new.get(t, 0) + count * ways
+            vector = new
+        coefficients = berlekamp_massey(terms)
+        return terms[:max(len(coefficients), 1)], coefficients
+
+    def perfect_matchings(self):
+        """
+        Return the exact number of Kekulé structures (see kekule_recurrence).
+        """
+        if self.get_n() % 2 == 1:
+            return 0
+        initial, coefficients = self.kekule_recurrence()
+        return linear_recurrence_term(initial, coefficients, self.repeats - 1)
+
+    def bloch_blocks(self):
+        """
+        Return the pair (H0, H1) of adjacency matrices (NumPy arrays indexed by cell_vertices)
+        of edges within a copy and of edges from a copy to the next one.
+        """
+        import numpy
+        index = {label: i for i, label in enumerate(self.cell_vertices)}
+
+        def locate(label):
+            for r in (0, 1, -1):
+                i = index.get(self._shift(label, -r))
+                if i is not None:
+                    return r, i
+            raise ValueError('copies of the unit cell may only touch consecutive copies')
+
+        b = len(self.cell_vertices)
+        h0, h1 = numpy.zeros((b, b)), numpy.zeros((b, b))
+        for label in self.cell_edges:
+            (r, i), (s, j) = sorted(locate(w) for w in bz.Edge.endpoint_labels(label))
+            if r == s:
+                h0[i, j] = h0[j, i] = 1
+            else:
+                h1[i, j] = 1
+        return h0, h1
+
+    def bloch_spectrum(self, chunk=4096):
+        """
+        Return the spectrum (a sorted NumPy array) of the periodic closure, i.e. of the graph in
+        which the last copy is joined to the first one as to a next copy (repeats >= 3).
+
+        Note: By Bloch's theorem the spectrum is the union over the wavevectors k = 2 pi j / R
+        (j = 0, ..., R - 1) of the spectra of the small Hermitian matrices
+        H0 + e^(ik) H1 + e^(-ik) H1^T, which are diagonalised in batches.
+        """
+        import numpy
+        if self.repeats < 3:
+            raise ValueError('the periodic closure needs at least 3 copies')
+        h0, h1 = self.bloch_blocks()
+        ret = []
+        for start in range(0, self.repeats, chunk):
+            k = 2 * math.pi * numpy.arange(start, min(start + chunk, self.repeats)) / self.repeats
+            phase = numpy.exp(1j * k)[:, None, None]
+            ret.append(numpy.linalg.eigvalsh(h0 + phase * h1 + phase.conj() * h1.T).ravel())
+        return numpy.sort(numpy.concatenate(ret))
+
+    def spectrum(self):
+        """
+        Return the spectrum of the (open) benzenoid itself.
+
+        Note: The copies at both ends break the translational symmetry, so the matrix is
+        diagonalised as a whole (see Benzenoid.spectrum); bloch_spectrum approximates it for
+        many copies.
+        """
+        return self.benzenoid().spectrum()
@@ -0,0 +1,95 @@
+import cProfile
+import glob
+import hashlib
+import json
+import logging
+import os
+import pstats
+import time
+
+
+logger = logging.getLogger(__name__)
+
+MAX_PROFILES = 200  # Number of most recent profiles kept in a directory.
+TOP_FUNCTIONS = 10  # Number of functions listed in the summary of a profile.
+
+
+def profile_key(text):
+    """
+    Return the key (a hexadecimal hash) under which the profile of the given input is saved.
+    """
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def top_functions(stats, limit=TOP_FUNCTIONS):
+    """
+    Return the list of dictionaries (function, calls, own and cumulative time) describing the
+    limit functions with the largest own time in the pstats.Stats object.
+    """
+    rows = []
+    for (filename, line, name), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({'function': '{0}:{1}({2})'.format(os.path.basename(filename), line, name),
+                     'calls': calls, 'tottime': round(tottime, 6), 'cumtime': round(cumtime, 6)})
+    rows.sort(key=lambda row: -row['tottime'])
+    return rows[:limit]
+
+
+class Profile(object):
+
+    def __init__(self, directory, label, text):
+        """
+        Construct a profile of the input text (e.g. a request or a file name), described by the
+        label; it is saved into the directory under the key of the text (see profile_key).
+        """
+        self.directory = directory
+        self.label = label
+        self.key = profile_key(text)
+        self.profiler = cProfile.Profile()
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.disable()
+        self.save(time.perf_counter() - self.start)
+        return False
+
+    def save(self, seconds):
+        """
+        Save the profile (<key>.prof, readable by pstats) and its summary (<key>.json), and
+        remove the oldest profiles above MAX_PROFILES.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, self.key)
+        self.profiler.dump_stats(path + '.prof')
+        summary = {'key': self.key, 'label': self.label, 'seconds': round(seconds, 6), 'time': time.time(),
+                   'top': top_functions(pstats.Stats(path + '.prof'))}
+        with open(path + '.json', 'w') as f:
+            json.dump(summary, f)
+        logger.info('profile %s saved (%s, %.3f s)', self.key, self.label, seconds)
+        summaries = sorted(glob.glob(os.path.join(self.directory, '*.json')), key=os.path.getmtime)
+        for old in summaries[:-MAX_PROFILES]:
+            for name in (old, old[:-len('.json')] + '.prof'):
+                try:
+                    os.remove(name)
+                except OSError:
+                    pass
+
+
+def slowest_profiles(directory, limit=20, recent=MAX_PROFILES):
+    """
+    Return the list of summaries (see Profile.save) of the limit slowest among the recent most
+    recently saved profiles in the directory.
+    """
+    summaries = []
+    for name in glob.glob(os.path.join(directory, '*.json')):
+        try:
+            with open(name) as f:
+                summaries.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    summaries.sort(key=lambda s: -s['time'])
+    return sorted(summaries[:recent], key=lambda s: -s['seconds'])[:limit]
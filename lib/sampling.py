@@ -0,0 +1,149 @@
+import math
+import multiprocessing
+import random
+
+import lib.lattice as lattice
+
+
+MODELS = ('eden', 'frontier', 'uniform')
+
+
+class Frontier(object):
+
+    def __init__(self):
+        """
+        Construct an empty set of growth slots that supports random choice in constant time.
+        """
+        self.items = []
+        self.position = dict()
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, x):
+        return x in self.position
+
+    def add(self, x):
+        if x not in self.position:
+            self.position[x] = len(self.items)
+            self.items.append(x)
+
+    def discard(self, x):
+        i = self.position.pop(x, None)
+        if i is None:
+            return
+        last = self.items.pop()
+        if i < len(self.items):
+            self.items[i] = last
+            self.position[last] = i
+
+    def choice(self, rng):
+        return self.items[rng.randrange(len(self.items))]
+
+
+def _grow(h, rng, model):
+    """
+    Grow one benzenoid with h hexagons. Return the list of hexagons and the logarithm of the
+    probability of acceptance used by the 'uniform' model.
+    """
+    hexagons = [(0, 0)]
+    occupied = {(0, 0)}
+    frontier = Frontier()
+    for f in lattice.face_neighbours((0, 0)):
+        frontier.add(f)
+    log_accept = 0.0
+    while len(hexagons) < h:
+        if model == 'eden':
+            # A random neighbour of a random hexagon; slots are chosen proportionally to
+            # the number of their occupied neighbours.
+            new = lattice.face_neighbours(hexagons[rng.randrange(len(hexagons))])[rng.randrange(6)]
+            if new in occupied:
+                continue
+        else:
+            new = frontier.choice(rng)
+            # No benzenoid with i hexagons has more than 2i + 4 growth slots.
+            log_accept += math.log(len(frontier) / (2 * len(hexagons) + 4))
+        hexagons.append(new)
+        occupied.add(new)
+        frontier.discard(new)
+        for f in lattice.face_neighbours(new):
+            if f not in occupied:
+                frontier.add(f)
+    return hexagons, log_accept
+
+
+def random_hexagons(h, rng=None, model='frontier', max_tries=10**6):
+    """
+    Return the list of hexagons of a random benzenoid with h hexagons (starting at (0, 0)).
+
+    Models:
+     - 'eden': each step adds a random empty neighbour of a random hexagon (Eden growth),
+     - 'frontier': each step adds a slot chosen uniformly among all empty adjacent slots,
+     - 'uniform': 'frontier' growth followed by rejection that makes all growth sequences
+       (orders of adding the hexagons, starting at (0, 0)) equally likely. It is uniform over
+       growth sequences, not over shapes: a benzenoid is drawn with probability proportional
+       to the number of its growth sequences, which favours compact shapes over elongated
+       ones. The acceptance rate drops exponentially with h.
+
+    Note: Holes may appear (i.e. coronoids are sampled as well).
+    """
+    if model not in MODELS:
+        raise ValueError('unknown model {0!r}'.format(model))
+    if h < 1:
+        raise ValueError('h must be positive')
+    if rng is None:
+        rng = random.Random()
+    for _ in range(max_tries):
+        hexagons, log_accept = _grow(h, rng, model)
+        if model != 'uniform' or math.log(1.0 - rng.random()) <= log_accept:
+            return hexagons
+    raise RuntimeError('no sample accepted in {0} tries'.format(max_tries))
+
+
+def random_benzenoid(h, seed=None, model='frontier', build=False):
+    """
+    Return a random benzenoid with h hexagons as a list of hexagons (or as a Benzenoid object
+    if build is True). See random_hexagons for the description of models.
+    """
+    hexagons = random_hexagons(h, random.Random(seed), model)
+    if build:
+        import lib.benzenoids as bz
+        return bz.Benzenoid(hexagons)
+    return hexagons
+
+
+def random_benzenoids(h, count=None, seed=None, model='frontier', build=False):
+    """
+    Make a generator object that will yield count (or infinitely many) random benzenoids.
+    """
+    rng = random.Random(seed)
+    i = 0
+    while count is None or i < count:
+        hexagons = random_hexagons(h, rng, model)
+        if build:
+            import lib.benzenoids as bz
+            yield bz.Benzenoid(hexagons)
+        else:
+            yield hexagons
+        i += 1
+
+
+def _sample_chunk(args):
+    h, count, seed, model = args
+    return list(random_benzenoids(h, count, seed, model))
+
+
+def parallel_random_benzenoids(h, count, seed=0, model='frontier', processes=None, chunk_size=1000):
+    """
+    Make a generator object that will yield count random benzenoids (as lists of hexagons)
+    sampled by a pool of worker processes.
+
+    Note: Chunk k is sampled with the seed '<seed>-<k>', so the output depends only on seed
+    and chunk_size (not on the number of processes).
+    """
+    chunks = [(h, min(chunk_size, count - start), '{0}-{1}'.format(seed, k), model)
+              for k, start in enumerate(range(0, count, chunk_size))]
+    with multiprocessing.Pool(processes) as pool:
+        for chunk in pool.imap(_sample_chunk, chunks):
+            for hexagons in chunk:
+                yield hexagons
@@ -0,0 +1,236 @@
+import itertools
+
+import lib.canonical as canonical
+import lib.lattice as lattice
+
+# NumPy is imported inside the functions (see lib.benzenoids).
+
+
+# Boundary regions given by the number of consecutive 3-valent vertices on the perimeter,
+# i.e. by the length of a maximal (cyclic) run of 1s in the boundary-edges code.
+REGIONS = {'bay': 1, 'cove': 2, 'fjord': 3}
+
+GRAM = 3  # Length of n-grams of boundary-edges codes in the index.
+
+
+def _mask_images(mask):
+    """
+    Return the 12 images of a 6-bit neighbourhood mask (bit nu is set if the neighbour at
+    position nu is present) under the symmetries of a hexagon.
+    """
+    bits = [(mask >> nu) & 1 for nu in range(6)]
+    ret = []
+    for r in range(6):
+        for reflect in (False, True):
+            ret.append(sum(bits[((r - nu) if reflect else (r + nu)) % 6] << nu for nu in range(6)))
+    return ret
+
+
+# The 13 classes of neighbourhoods of a hexagon up to symmetry; MASK_CLASS maps a mask to its class.
+NEIGHBOURHOOD_CLASSES = sorted({min(_mask_images(mask)) for mask in range(64)})
+MASK_CLASS = [NEIGHBOURHOOD_CLASSES.index(min(_mask_images(mask))) for mask in range(64)]
+# MASK_COVERS[mask][c] is True if some submask of mask belongs to class c.
+MASK_COVERS = [[any(MASK_CLASS[sub] == c for sub in range(64) if sub & mask == sub)
+                for c in range(len(NEIGHBOURHOOD_CLASSES))] for mask in range(64)]
+
+
+def fingerprint(hexagons):
+    """
+    Return the fingerprint of a set of hexagons as a NumPy array: the c-th entry is the number
+    of hexagons whose neighbourhood contains a neighbourhood of class c.
+
+    Note: The fingerprint is monotone: if A can be mapped into B by a lattice symmetry and a
+    translation, then the fingerprint of A does not exceed the fingerprint of B in any entry.
+    """
+    import numpy
+    faces = set(hexagons)
+    masks = [sum(1 << nu for nu, f in enumerate(lattice.face_neighbours(x)) if f in faces) for x in faces]
+    covers = numpy.array(MASK_COVERS, dtype=numpy.int32)
+    return covers[masks].sum(axis=0) if len(masks) > 0 else numpy.zeros(len(NEIGHBOURHOOD_CLASSES), dtype=numpy.int32)
+
+
+def region_mask(bec):
+    """
+    Return the bit mask of regions (bit k - 1 for a run of exactly k 1s, see REGIONS) on the
+    boundary described by a boundary-edges code.
+    """
+    if '1' not in bec or set(bec) == {'1'}:
+        return 0
+    pos = next(i for i, c in enumerate(bec) if c != '1')
+    ret = 0
+    for k, group in itertools.groupby(bec[pos:] + bec[:pos]):
+        if k == '1':
+            ret |= 1 << (min(len(list(group)), 8) - 1)
+    return ret
+
+
+def _grams(bec):
+    """
+    Return the set of n-grams (as integers) of the cyclic boundary-edges code.
+    """
+    cyclic = (bec * GRAM)[:len(bec) + GRAM - 1]
+    return {int(cyclic[i:i + GRAM], 7) for i in range(len(bec))}
+
+
+def contains_cyclic(bec, motif):
+    """
+    Return True if the motif (a string of digits) occurs in the cyclic boundary-edges code in
+    either direction.
+    """
+    if len(motif) > len(bec):
+        cyclic = bec * (len(motif) // len(bec) + 2)
+    else:
+        cyclic = bec + bec[:len(motif) - 1]
+    return motif in cyclic or motif[::-1] in cyclic
+
+
+def embeds(pattern, hexagons):
+    """
+    Return True if the list of hexagons pattern can be mapped into the set of hexagons by a
+    lattice symmetry and a translation.
+    """
+    faces = set(hexagons)
+    if len(pattern) > len(faces):
+        return False
+    for image in canonical.symmetries(pattern):
+        a_xi, a_eta = image[0]
+        for g_xi, g_eta in faces:
+            d_xi, d_eta = g_xi - a_xi, g_eta - a_eta
+            if all((xi + d_xi, eta + d_eta) in faces for xi, eta in image):
+                return True
+    return False
+
+
+class SearchIndex(object):
+
+    def __init__(self, benzenoids, becs=None):
+        """
+        Build the index over a collection of benzenoids (lists of hexagons). The entries are
+        numbered 0, 1, ... in the given order. The canonical boundary-edges codes may be
+        given (e.g. from a catalogue); otherwise they are computed.
+        """
+        import numpy
+        flat, offsets, codes, regions, fingerprints, pairs = [], [0], [], [], [], []
+        for i, hexagons in enumerate(benzenoids):
+            hexagons = [tuple(h) for h in hexagons]
+            if becs is None:
+                bec = lattice.boundary_edges_code(set(hexagons))
+            else:
+                bec = becs[i]
+            flat.extend(c for h in hexagons for c in h)
+            offsets.append(len(flat) // 2)
+            codes.append(bec)
+            regions.append(region_mask(bec))
+            fingerprints.append(fingerprint(hexagons))
+            pairs.extend((g, i) for g in _grams(bec))
+        self.hexagons = numpy.array(flat, dtype=numpy.int32).reshape(-1, 2)
+        self.offsets = numpy.array(offsets, dtype=numpy.int64)
+        self.becs = codes
+        self.regions = numpy.array(regions, dtype=numpy.uint8)
+        self.fingerprints = numpy.array(fingerprints, dtype=numpy.int32).reshape(-1, len(NEIGHBOURHOOD_CLASSES))
+        self.sizes = numpy.diff(self.offsets)
+        # Posting lists: ids of entries containing the n-gram g are postings[starts[g]:starts[g + 1]].
+        pairs = numpy.array(pairs, dtype=numpy.int64).reshape(-1, 2)
+        order = numpy.lexsort((pairs[:, 1], pairs[:, 0]))
+        self.postings = pairs[order, 1]
+        self.starts = numpy.searchsorted(pairs[order, 0], numpy.arange(7 ** GRAM + 1))
+
+    @classmethod
+    def from_catalogue(cls, cat):
+        """
+        Build the index over all entries of a catalogue (see lib.catalogue).
+        """
+        return cls((cat.record(i)['hexagons'] for i in range(len(cat))),
+                   becs=[b.decode('ascii') for b in cat.columns['bec']])
+
+    def save(self, path):
+        """
+        Save the index into a NumPy .npz file.
+        """
+        import numpy
+        numpy.savez(path, hexagons=self.hexagons, offsets=self.offsets, regions=self.regions,
+                    fingerprints=self.fingerprints, postings=self.postings, starts=self.starts,
+                    becs=numpy.array([b.encode('ascii') for b in self.becs]))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load an index saved by save.
+        """
+        import numpy
+        index = cls([])
+        with numpy.load(path) as data:
+            for name in ('hexagons', 'offsets', 'regions', 'fingerprints', 'postings', 'starts'):
+                setattr(index, name, data[name])
+            index.becs = [b.decode('ascii') for b in data['becs']]
+        index.sizes = numpy.diff(index.offsets)
+        return index
+
+    def __len__(self):
+        return len(self.becs)
+
+    def entry(self, i):
+        """
+        Return the list of hexagons of the i-th entry.
+        """
+        return [tuple(h) for h in self.hexagons[self.offsets[i]:self.offsets[i + 1]].tolist()]
+
+    def _posting(self, gram):
+        return self.postings[self.starts[gram]:self.starts[gram + 1]]
+
+    def with_motif(self, motif):
+        """
+        Return the sorted NumPy array of ids of entries whose boundary-edges code contains the
+        motif (a string of digits, read in either direction, cyclically).
+        """
+        import numpy
+        if any(c not in '123456' for c in motif):
+            raise ValueError('a motif consists of digits 1 to 6')
+        if len(motif) >= GRAM:
+            candidates = numpy.array([], dtype=numpy.int64)
+            for word in {motif, motif[::-1]}:
+                ids = None
+                for i in range(len(word) - GRAM + 1):
+                    posting = self._posting(int(word[i:i + GRAM], 7))
+                    ids = posting if ids is None else numpy.intersect1d(ids, posting, assume_unique=True)
+                candidates = numpy.union1d(candidates, ids)
+        else:
+            candidates = numpy.arange(len(self))
+        return numpy.array([i for i in candidates.tolist() if contains_cyclic(self.becs[i], motif)],
+                           dtype=numpy.int64)
+
+    def with_region(self, region):
+        """
+        Return the sorted NumPy array of ids of entries with a bay, cove or fjord (see REGIONS).
+        """
+        import numpy
+        if region not in REGIONS:
+            raise ValueError('unknown region {0!r}'.format(region))
+        bit = 1 << (REGIONS[region] - 1)
+        return numpy.nonzero(self.regions & bit)[0]
+
+    def containing(self, pattern):
+        """
+        Return the sorted NumPy array of ids of entries that contain the sub-benzenoid given by
+        the list of its hexagons (up to lattice symmetries and translations).
+
+        Note: Candidates are filtered by size and by fingerprints; only the survivors are verified.
+        """
+        return self.query(pattern=pattern)
+
+    def query(self, regions=(), motifs=(), pattern=None):
+        """
+        Return the sorted NumPy array of ids of entries that have all the given regions, contain
+        all the given motifs in their boundary-edges codes and contain the given sub-benzenoid.
+        """
+        import numpy
+        ids = numpy.arange(len(self))
+        for region in regions:
+            ids = numpy.intersect1d(ids, self.with_region(region), assume_unique=True)
+        for motif in motifs:
+            ids = numpy.intersect1d(ids, self.with_motif(motif), assume_unique=True)
+        if pattern is not None:
+            pattern = [tuple(h) for h in pattern]
+            keep = (self.sizes[ids] >= len(set(pattern))) & (self.fingerprints[ids] >= fingerprint(pattern)).all(axis=1)
+            ids = numpy.array([i for i in ids[keep].tolist() if embeds(pattern, self.entry(i))], dtype=numpy.int64)
+        return ids
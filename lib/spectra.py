@@ -0,0 +1,65 @@
+import multiprocessing
+
+import lib.lattice as lattice
+
+# NumPy is imported inside the functions (see lib.benzenoids).
+
+
+def stacked_adjacency(endpoints, n):
+    """
+    Return the B x n x n NumPy array of adjacency matrices of B graphs on n vertices given by
+    the list of their m x 2 arrays of endpoints of edges.
+    """
+    import numpy
+    ret = numpy.zeros((len(endpoints), n, n))
+    if len(endpoints) == 0:
+        return ret
+    b = numpy.repeat(numpy.arange(len(endpoints)), [len(e) for e in endpoints])
+    u, v = numpy.concatenate(endpoints).T
+    ret[b, u, v] = 1
+    ret[b, v, u] = 1
+    return ret
+
+
+def _chunk_spectra(args):
+    n, endpoints = args
+    import numpy
+    return numpy.linalg.eigvalsh(stacked_adjacency(endpoints, n))
+
+
+def _collect(count, targets, results):
+    ret = [None] * count
+    for positions, spectra in zip(targets, results):
+        for i, spectrum in zip(positions, spectra):
+            ret[i] = spectrum
+    return ret
+
+
+def batch_spectra(benzenoids, max_bytes=1 << 27, processes=None):
+    """
+    Return the list of spectra (NumPy arrays of eigenvalues in non-decreasing order, as in
+    Benzenoid.spectrum) of the benzenoids (Benzenoid objects or lists of hexagons).
+
+    Benzenoids are grouped by the number of vertices; each group is split into chunks of
+    stacked adjacency matrices taking at most max_bytes and every chunk is diagonalised by
+    a single call of numpy.linalg.eigvalsh. If processes is not None, chunks are spread over a
+    pool of that many worker processes (0 means one per CPU).
+    """
+    groups = dict()  # n -> (positions, endpoints)
+    count = 0
+    for benzenoid in benzenoids:
+        vertices, _, endpoints = lattice.graph_arrays(lattice.hexagon_list(benzenoid))
+        positions, group = groups.setdefault(len(vertices), ([], []))
+        positions.append(count)
+        group.append(endpoints)
+        count += 1
+    chunks, targets = [], []
+    for n, (positions, group) in sorted(groups.items()):
+        size = max(1, max_bytes // (8 * n * n))
+        for start in range(0, len(group), size):
+            chunks.append((n, group[start:start + size]))
+            targets.append(positions[start:start + size])
+    if processes is None:
+        return _collect(count, targets, map(_chunk_spectra, chunks))
+    with multiprocessing.Pool(processes or None) as pool:
+        return _collect(count, targets, pool.imap(_chunk_spectra, chunks))
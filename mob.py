@@ -46,18 +46,92 @@
 
 from flask import * 
 import os
+import gzip
+import hashlib
+import logging
 import analyser
+import lib.catalogue as catalogue
+import lib.importer as importer
+import lib.jobs as jobs
+import lib.metrics as metrics
+import lib.profiling as profiling
+import lib.search as search
+from werkzeug.utils import secure_filename
 
 ###Paths
 UPLOAD_FOLDER = 'temp'
-ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg', 'gif'}
+ALLOWED_EXTENSIONS = {'txt', 'csv', 'dat', 'bec', 'pc'}
 
 ###App
 app = Flask(__name__, static_url_path='/static')
 
 ###Configs
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024 ### largest accepted upload (bytes)
+app.config['JOB_PROCESSES'] = None ### worker processes for upload jobs (None: one per CPU)
+app.config['JOB_CHUNK_SIZE'] = 100 ### benzenoids per task (progress is reported per chunk)
+app.config['PROFILING'] = False ### allow profiling of single requests (header X-Profile: 1 or ?profile=1)
+app.config['PROFILE_FOLDER'] = 'profiles' ### profiles are saved here, keyed by the hash of the input
 app.debug = True ### debug mode on
+app.config['CODE_VERSION'] = '0.1' ### part of every ETag; bump it when results change
+app.config['GZIP_MIN_SIZE'] = 500 ### smaller responses are sent uncompressed
+app.config['GZIP_TYPES'] = {'text/html', 'application/json', 'text/plain'}
+app.config['CATALOGUE'] = os.path.join('data', 'catalogue.bin') ### built by: python3 -m lib.catalogue --max-h 10
+
+###Catalogue (memory-mapped, shared by all workers)
+CATALOGUE = catalogue.Catalogue(app.config['CATALOGUE']) if os.path.exists(app.config['CATALOGUE']) else None
+SEARCH_INDEX = None ### built over the catalogue on the first search
+
+###Upload jobs (analysed in the background, see lib.jobs)
+JOBS = jobs.JobManager(app.config['UPLOAD_FOLDER'], analyser.batch_analyse, analyser.BATCH_FIELDS, render=analyser.hex2png,
+		       processes=app.config['JOB_PROCESSES'], chunk_size=app.config['JOB_CHUNK_SIZE'])
+
+###Hooks
+@app.before_request
+def start_timer():
+	metrics.begin_request()
+
+@app.before_request
+def start_profile():
+	if app.config['PROFILING'] and (request.headers.get('X-Profile') == '1' or request.args.get('profile') == '1'):
+		args = '&'.join('{0}={1}'.format(k, v) for k, v in sorted(request.args.items(multi=True)) if k != 'profile')
+		text = request.path + '?' + args + '\0' + request.get_data(as_text=True)
+		g.profile = profiling.Profile(app.config['PROFILE_FOLDER'], request.method + ' ' + request.full_path, text)
+		try:
+			g.profile.__enter__()
+		except ValueError: ### another profiler is active in this process
+			g.profile = None
+
+@app.teardown_request
+def stop_timer(exc):
+	if request.endpoint not in ('static', 'prometheus_metrics'):
+		metrics.end_request(request.endpoint or 'unknown')
+	profile = g.pop('profile', None)
+	if profile is not None:
+		profile.__exit__(None, None, None)
+
+@app.after_request
+def cache_and_compress(response):
+	if request.path.startswith('/static/outfiles/') and response.status_code in (200, 304):
+		# Pictures are named by the BEC, but inputs with the same BEC (rotations, reflections,
+		# other holes) are drawn differently and overwrite the file, so caches must revalidate
+		# (cheap thanks to the ETag and Last-Modified of static files).
+		response.cache_control.public = True
+		response.cache_control.no_cache = True
+	if (response.status_code == 200 and not response.direct_passthrough
+	    and response.mimetype in app.config['GZIP_TYPES']
+	    and 'gzip' in request.headers.get('Accept-Encoding', '')
+	    and 'Content-Encoding' not in response.headers):
+		data = response.get_data()
+		if len(data) >= app.config['GZIP_MIN_SIZE']:
+			response.set_data(gzip.compress(data, compresslevel=6))
+			response.headers['Content-Encoding'] = 'gzip'
+			# The compressed body is a different representation, so a strong ETag becomes weak.
+			etag, weak = response.get_etag()
+			if etag is not None:
+				response.set_etag(etag, weak=True)
+		response.vary.add('Accept-Encoding')
+	return response
 
 ###Routes
 @app.route("/mob",methods=['GET', 'POST'])
@@ -77,18 +151,21 @@ def hello():
 			image = getBCI(outp)
 			return render_template('results.html', input=text, output=outp, comment = image)
 		# check if the post request has the file part
+		elif 'file' in request.files:
+			file = request.files['file']
+			if file.filename == '' or not allowed_file(file.filename):
+				return redirect(request.url)
+			filename = secure_filename(file.filename)
+			try:
+				job_id = JOBS.submit(file.stream, filename, request.form.get('format', 'bec'),
+						     pictures='pictures' in request.form)
+			except ValueError:
+				return redirect(request.url)
+			return redirect(url_for('job_status', job_id=job_id))
 		else:
 			return redirect(request.url)
-		if 'file' not in request.files:
-			#			flash('No file part')
-			return redirect(request.url)
-		file = request.files['file']
-		if file and allowed_file(file.filename) and file.filename != '':
-			filename = secure_filename(file.filename)
-			file.save(os.path.join(app.config['UPLOAD_FOLDER'], filename))
-			return redirect(url_for('uploaded_file',filename=filename))
 	else:
-		return render_template('welcomepage.html')
+		return render_template('welcomepage.html', formats=sorted(importer.READERS))
 	
 @app.route("/mob/draw",methods=['GET'])
 def calc():
@@ -104,8 +181,91 @@ def res():
 		if request.args.get('coords'):
 			textc = request.args.get('coords')
 			processed = textc.upper()  
-			return render_template('results.html', input=textc, output=analyser.str2benzenoid(processed))
+			etag = results_etag(processed)
+			if request.if_none_match.contains_weak(etag):
+				response = Response(status=304)
+			else:
+				response = make_response(render_template('results.html', input=textc, output=analyser.str2benzenoid(processed)))
+			response.set_etag(etag)
+			response.cache_control.public = True
+			response.cache_control.no_cache = True ### always revalidate (cheap thanks to the ETag)
+			return response
 	
+@app.route("/mob/api/analyse",methods=['POST'])
+def api_analyse():
+	jn = request.get_json(silent=True) or {}
+	coords = jn.get('coords')
+	if not coords:
+		return jsonify(dict(error='Error! No coordinates given!')), 400
+	try:
+		return jsonify(analyser.str2json(coords))
+	except Exception as error:
+		return jsonify(dict(error=str(error))), 400
+
+@app.route("/mob/api/bec/<code>")
+def api_bec(code):
+	if CATALOGUE is not None:
+		record = CATALOGUE.lookup(code)
+		if record is not None:
+			return jsonify(record)
+	try:
+		return jsonify(analyser.bec2record(code))
+	except Exception as error:
+		return jsonify(dict(error=str(error))), 400
+
+@app.route("/mob/api/search")
+def api_search():
+	global SEARCH_INDEX
+	if CATALOGUE is None:
+		return jsonify(dict(error='Error! No catalogue is available!')), 404
+	if SEARCH_INDEX is None:
+		SEARCH_INDEX = search.SearchIndex.from_catalogue(CATALOGUE)
+	try:
+		pattern = request.args.get('pattern')
+		ids = SEARCH_INDEX.query(regions=request.args.getlist('region'), motifs=request.args.getlist('motif'),
+					 pattern=None if pattern is None else analyser.str2coord(pattern))
+	except Exception as error:
+		return jsonify(dict(error=str(error))), 400
+	limit = request.args.get('limit', 100, type=int)
+	return jsonify(dict(count=len(ids), results=[SEARCH_INDEX.becs[i] for i in ids[:limit].tolist()]))
+
+@app.route("/mob/jobs/<job_id>")
+def job_status(job_id):
+	job = JOBS.get(job_id)
+	if job is None:
+		abort(404)
+	return render_template('job.html', job=job.info())
+
+@app.route("/mob/api/jobs/<job_id>")
+def api_job(job_id):
+	job = JOBS.get(job_id)
+	if job is None:
+		return jsonify(dict(error='Error! No such job!')), 404
+	return jsonify(job.info())
+
+@app.route("/mob/jobs/<job_id>/results.<kind>")
+def job_results(job_id, kind):
+	job = JOBS.get(job_id)
+	if job is None or job.status != 'done' or kind not in ('csv', 'zip'):
+		abort(404)
+	if kind == 'csv':
+		return send_file(os.path.abspath(job.csv_path()), mimetype='text/csv', as_attachment=True,
+				 download_name='results.csv')
+	return send_file(os.path.abspath(JOBS.archive(job)), mimetype='application/zip',
+			 as_attachment=True, download_name='results.zip')
+
+@app.route("/mob/profiles")
+def profiles():
+	if not app.config['PROFILING']:
+		abort(404)
+	return render_template('profiles.html', profiles=profiling.slowest_profiles(app.config['PROFILE_FOLDER']))
+
+@app.route("/mob/profiles/<key>.prof")
+def profile_file(key):
+	if not app.config['PROFILING']:
+		abort(404)
+	return send_from_directory(os.path.abspath(app.config['PROFILE_FOLDER']), key + '.prof', as_attachment=True)
+
 @app.route("/mob/help")
 def help():
 	return render_template('help.html')
@@ -122,7 +282,17 @@ def contact():
 def deb():
 	return render_template('index.html')
 
+@app.route("/metrics")
+def prometheus_metrics():
+	return Response(metrics.prometheus_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 ###Subs
+def results_etag(coords):
+	# The page is a function of the input alone (for a given code version), so the ETag is
+	# computed before anything is parsed or drawn.
+	key = app.config['CODE_VERSION'] + '\0' + coords
+	return hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+
 def allowed_file(filename):
 	return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -138,7 +308,7 @@ def getBCI(istring):
 
 ###Run as main
 if __name__ == "__main__":
-	
+	logging.basicConfig(level=logging.INFO)
 	app.run()
 
 ###Laters
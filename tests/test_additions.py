@@ -0,0 +1,41 @@
+import itertools
+
+import pytest
+
+import lib.benzenoids as bz
+import lib.catalogue as catalogue
+import lib.families as families
+
+
+PROPS = ('bec', 'deficit', 'kekule', 'gap')
+COMBINATIONS = [c for k in range(1, len(PROPS) + 1) for c in itertools.combinations(PROPS, k)]
+BENZENOIDS = [h for h in catalogue.enumerate_benzenoids(5) if len(h) in (1, 2, 4, 5)] + [
+    [(0, 0), (1, 0), (0, -1), (-1, 0), (-2, 0)],  # Odd number of vertices.
+    families.coronoid(2),
+]
+
+
+def test_both_parities_are_covered():
+    parities = {bz.Benzenoid(h).get_n() % 2 for h in BENZENOIDS}
+    assert parities == {0, 1}
+
+
+@pytest.mark.parametrize('hexagons', BENZENOIDS)
+@pytest.mark.parametrize('props', COMBINATIONS)
+def test_evaluate_additions_by_copy(hexagons, props):
+    b = bz.Benzenoid(hexagons)
+    values = b.evaluate_additions(props)
+    assert set(values) == b.empty_face_slots()
+    for slot, got in values.items():
+        expected = b._evaluate_addition_by_copy(slot, props)
+        assert set(got) == set(props)
+        for p in props:
+            if p == 'gap':
+                assert got[p] == pytest.approx(expected[p], abs=1e-7), slot
+            else:
+                assert got[p] == expected[p], slot
+
+
+def test_unknown_property():
+    with pytest.raises(ValueError):
+        bz.Benzenoid([(0, 0)]).evaluate_additions(('size',))
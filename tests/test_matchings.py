@@ -0,0 +1,58 @@
+import numpy
+import pytest
+
+import lib.benzenoids as bz
+import lib.catalogue as catalogue
+import lib.families as families
+import lib.matchings as matchings
+
+
+def brute_force_matching_numbers(n, endpoints):
+    """
+    Return [m_0, ..., m_(n//2)] by deciding for every edge whether it is in the matching.
+    """
+    edges = [tuple(e) for e in endpoints.tolist()]
+    ret = [0] * (n // 2 + 1)
+
+    def extend(i, used, k):
+        if i == len(edges):
+            ret[k] += 1
+            return
+        extend(i + 1, used, k)
+        u, v = edges[i]
+        if u not in used and v not in used:
+            extend(i + 1, used | {u, v}, k + 1)
+
+    extend(0, frozenset(), 0)
+    return ret
+
+
+SMALL = list(catalogue.enumerate_benzenoids(5)) + [families.hexagonal(2)]
+
+
+@pytest.mark.parametrize('hexagons', SMALL)
+def test_matching_numbers_brute_force(hexagons):
+    b = bz.Benzenoid(hexagons)
+    expected = brute_force_matching_numbers(b.get_n(), b.edge_endpoints())
+    assert b.matching_numbers() == expected
+    assert b.hosoya_index() == sum(expected)
+    polynomial = b.matching_polynomial()
+    assert len(polynomial) == b.get_n() + 1
+    assert [abs(c) for c in polynomial[::2]] == expected
+
+
+@pytest.mark.parametrize('hexagons', list(catalogue.enumerate_benzenoids(6)))
+def test_perfect_matchings(hexagons):
+    b = bz.Benzenoid(hexagons)
+    vertices = numpy.array(b.vertex_labels(), dtype=numpy.int64).reshape(-1, 3)
+    expected = b.perfect_matchings() if b.get_n() % 2 == 0 else 0
+    assert b.get_n() % 2 == 1 or b.matching_numbers()[-1] == expected
+    assert matchings.count_perfect_matchings(vertices, b.edge_endpoints()) == expected
+    assert sum(1 for _ in b.kekule_structures()) == expected
+
+
+def test_known_values():
+    # Benzene: the matching polynomial is x^6 - 6x^4 + 9x^2 - 2 and the Hosoya index is 18.
+    benzene = bz.Benzenoid([(0, 0)])
+    assert benzene.matching_polynomial() == [1, 0, -6, 0, 9, 0, -2]
+    assert benzene.hosoya_index() == 18
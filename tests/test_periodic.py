@@ -0,0 +1,84 @@
+import numpy
+import pytest
+
+import lib.benzenoids as bz
+import lib.periodic as periodic
+
+
+# Unit cells and translations: acene, zigzag strips, armchair-like chains and odd systems.
+CELLS = [
+    ([(0, 0)], (1, 0)),
+    ([(0, 0)], (1, -1)),
+    ([(0, j) for j in range(3)], (1, 0)),
+    ([(0, 0), (0, 1)], (1, 0)),
+    ([(0, 0), (0, 1)], (1, 1)),
+    ([(0, 0), (1, -1)], (1, 0)),
+    ([(0, 0), (1, 0), (1, 1)], (2, 0)),
+    ([(0, 0), (0, 1), (-1, 1)], (1, 1)),
+]
+
+
+def closure_adjacency(p):
+    """
+    Return the dense adjacency matrix of the periodic closure built from the Bloch blocks.
+    """
+    h0, h1 = p.bloch_blocks()
+    b, r = len(h0), p.repeats
+    ret = numpy.zeros((r * b, r * b))
+    for i in range(r):
+        j = (i + 1) % r
+        ret[i * b:(i + 1) * b, i * b:(i + 1) * b] = h0
+        ret[i * b:(i + 1) * b, j * b:(j + 1) * b] += h1
+        ret[j * b:(j + 1) * b, i * b:(i + 1) * b] += h1.T
+    return ret
+
+
+@pytest.mark.parametrize('cell, translation', CELLS)
+@pytest.mark.parametrize('repeats', range(1, 7))
+def test_agrees_with_benzenoid(cell, translation, repeats):
+    p = periodic.PeriodicBenzenoid(cell, translation, repeats)
+    b = bz.Benzenoid(p.hexagon_list())
+    assert (p.get_h(), p.get_n(), p.get_m()) == (b.get_h(), b.get_n(), b.get_m())
+    assert p.boundary_edges_code() == b.boundary_edges_code()
+    assert p.convex_deficit() == b.convex_deficit()
+    expected = b.matching_numbers()[-1] if b.get_n() % 2 == 0 else 0
+    assert p.perfect_matchings() == expected
+    if b.get_n() % 2 == 0:
+        assert p.perfect_matchings() == b.perfect_matchings()
+
+
+@pytest.mark.parametrize('cell, translation', CELLS)
+@pytest.mark.parametrize('repeats', range(3, 7))
+def test_bloch_spectrum_of_closure(cell, translation, repeats):
+    p = periodic.PeriodicBenzenoid(cell, translation, repeats)
+    expected = numpy.linalg.eigvalsh(closure_adjacency(p))
+    assert numpy.allclose(p.bloch_spectrum(), expected)
+
+
+def test_large_repeats_follow_recurrence():
+    # Zigzag strips of width w have C(k + w, w) Kekulé structures.
+    for width in (1, 2, 3, 5):
+        p = periodic.PeriodicBenzenoid([(0, j) for j in range(width)], (1, 0), 1000)
+        k = 1000
+        expected = 1
+        for i in range(1, width + 1):
+            expected = expected * (k + i) // i
+        assert p.perfect_matchings() == expected
+
+
+def test_berlekamp_massey():
+    fibonacci = [1, 1]
+    for _ in range(10):
+        fibonacci.append(fibonacci[-1] + fibonacci[-2])
+    assert periodic.berlekamp_massey(fibonacci) == [1, 1]
+    assert periodic.linear_recurrence_term(fibonacci[:2], [1, 1], 50) == 20365011074
+
+
+@pytest.mark.parametrize('cell, translation', [
+    ([(0, 0)], (0, 0)),
+    ([(0, 0)], (3, 0)),
+    ([(0, 0), (1, 0)], (1, 0)),
+])
+def test_invalid_cells(cell, translation):
+    with pytest.raises(ValueError):
+        periodic.PeriodicBenzenoid(cell, translation, 3)
@@ -0,0 +1,69 @@
+import gc
+import pickle
+
+import numpy
+import pytest
+
+import lib.benzenoids as bz
+import lib.catalogue as catalogue
+import lib.families as families
+
+
+BENZENOIDS = list(catalogue.enumerate_benzenoids(4)) + [families.coronoid(2), families.random_growth(40, seed=1)]
+
+
+def graph(b):
+    """
+    Return the adjacency/incidence lists (by labels) of every face, edge and vertex.
+    """
+    ret = dict()
+    for f in b.face_dict.values():
+        ret[f.label, 'f'] = ([v.label for v in f.incident_vertices()], [e.label for e in f.incident_edges()],
+                             [g.label for g in f.adjacent_faces()])
+    for e in b.edge_dict.values():
+        ret[e.label, 'e'] = ([v.label for v in e.incident_vertices()], [g.label for g in e.adjacent_edges()],
+                             [f.label for f in e.incident_faces()])
+    for v in b.vertex_dict.values():
+        ret[v.label, 'v'] = ([u.label for u in v.adjacent_vertices()], [e.label for e in v.incident_edges()],
+                             [f.label for f in v.incident_faces()])
+    return ret
+
+
+@pytest.mark.parametrize('hexagons', BENZENOIDS)
+def test_restored_graph(hexagons):
+    b = bz.Benzenoid(hexagons)
+    b.boundary_edges_code()
+    for other in (b.copy(), bz.Benzenoid.from_bytes(b.to_bytes()), pickle.loads(pickle.dumps(b))):
+        assert graph(other) == graph(b)
+        assert other.frontier == b.frontier
+        assert other.is_connected() == b.is_connected()
+        assert other.get_bottom_left_hexagon().label == b.get_bottom_left_hexagon().label
+        assert other.boundary_edges_code() == b.boundary_edges_code()
+
+
+def test_copy_does_not_share_memo():
+    b = bz.Benzenoid(families.hexagonal(2))
+    endpoints = b.edge_endpoints()
+    labels = b.vertex_labels()
+    c = b.copy()
+    assert c.edge_endpoints() is not endpoints and c.vertex_labels() is not labels
+    c.edge_endpoints()[0] = -1
+    c.vertex_labels().append(None)
+    assert endpoints.min() == 0 and None not in labels
+
+
+def test_shared_arrays_are_read_only():
+    b = bz.Benzenoid(families.hexagonal(2))
+    b.edge_endpoints()
+    shm = b.to_shared_memory()
+    try:
+        other = bz.Benzenoid.from_shared_memory(shm.name)
+        assert numpy.array_equal(other.edge_endpoints(), b.edge_endpoints())
+        assert not other.edge_endpoints().flags.writeable
+        attached = other.shared_memory
+        del other
+        gc.collect()  # The graph has reference cycles; the views must go before closing.
+        attached.close()
+    finally:
+        shm.close()
+        shm.unlink()